@@ -0,0 +1,252 @@
+"""Benchmarks for the Queue Editor's hot paths, with the WAN2GP globals it requests stubbed out.
+
+Run it from a WAN2GP checkout, with this plugin installed under plugins/:
+
+    python plugins/<plugin folder>/benchmarks/bench_queue_editor.py --sizes 100 1000 10000
+
+Each size gets a synthetic queue.zip (PNG start/end images, LoRAs, mixed model types)
+and a fresh plugin whose disk caches live in their own temp dir, so every run starts
+cold. Operations are timed in one pass and, unless --no-memory is given, measured for
+peak Python allocations (tracemalloc) in a second, identical pass. Payload bytes are the
+HTML and patch strings the handler would send to the browser.
+"""
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    "cinematic portrait of a woman walking through neon city rain at night, slow dolly shot, "
+    "volumetric light, golden hour over misty mountains, a dragon circling an ancient castle, "
+    "close up of a robot hand, ocean waves crashing on black sand beach, drone flyover"
+).replace(",", "").split()
+MODEL_TYPES = ("t2v", "i2v", "vace_14B")
+LORA_NAMES = [f"style_{i:02d}.safetensors" for i in range(20)]
+
+
+def load_plugin_module(wan2gp_root):
+    if wan2gp_root not in sys.path:
+        sys.path.insert(0, wan2gp_root)
+    package = os.path.basename(PLUGIN_DIR).replace("-", "_") or "queue_editor"
+    spec = importlib.util.spec_from_file_location(package, os.path.join(PLUGIN_DIR, "__init__.py"),
+                                                  submodule_search_locations=[PLUGIN_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[package] = module
+    spec.loader.exec_module(module)
+    return importlib.import_module(f"{package}.plugin")
+
+
+class UploadedFile:
+    def __init__(self, name):
+        self.name = name
+
+
+class HostStubs:
+    """Stand-ins for the WAN2GP globals requested in setup_ui, cheap but shaped like the real ones."""
+
+    def __init__(self, workdir, image_size):
+        from PIL import Image
+        self._image = Image
+        self.image_size = image_size
+        self.lora_dir = os.path.join(workdir, "loras")
+        os.makedirs(self.lora_dir, exist_ok=True)
+        for name in LORA_NAMES + [f"replacement_{i:02d}.safetensors" for i in range(5)]:
+            open(os.path.join(self.lora_dir, name), "wb").close()
+
+    def install(self, plugin):
+        plugin._parse_queue_zip = self.parse_queue_zip
+        plugin.get_preview_images = self.get_preview_images
+        plugin.get_video_frame = self.get_video_frame
+        plugin.get_video_info = lambda path: (16, self.image_size[0], self.image_size[1], 81)
+        plugin.extract_source_images = lambda path, tmpdir: {}
+        plugin.has_image_file_extension = lambda path: path.lower().endswith((".png", ".jpg", ".jpeg", ".webp"))
+        plugin.has_video_file_extension = lambda path: path.lower().endswith((".mp4", ".mkv", ".webm"))
+        plugin.get_lora_dir = lambda model_type: self.lora_dir
+        plugin.update_loras_url_cache = lambda lora_dir, loras: loras
+        plugin.get_gen_info = lambda state: state.setdefault("gen", {"queue": []})
+        plugin.update_queue_data = lambda queue: f"<div>{len(queue)} tasks</div>"
+
+    def get_preview_images(self, params):
+        def as_list(value):
+            if value is None:
+                return None
+            return value if isinstance(value, list) else [value]
+        start = as_list(params.get("image_start")) or as_list(params.get("image_refs"))
+        end = as_list(params.get("image_end"))
+        return start, end, ["Start"] * len(start or []), ["End"] * len(end or [])
+
+    def get_video_frame(self, path, frame_no, return_last_if_missing=True, return_PIL=True):
+        seed = hash((os.path.basename(path), frame_no)) & 0xFFFFFF
+        return self._image.new("RGB", self.image_size, (seed & 0xFF, (seed >> 8) & 0xFF, seed >> 16))
+
+    def parse_queue_zip(self, filename, state):
+        tasks = []
+        with zipfile.ZipFile(filename) as zf:
+            for i, entry in enumerate(json.loads(zf.read("queue.json"))):
+                params = dict(entry.get("params", {}))
+                for key in ("image_start", "image_end"):
+                    names = params.get(key) or []
+                    params[key] = [self._image.open(io.BytesIO(zf.read(name))).convert("RGB") for name in names] or None
+                tasks.append({"id": entry.get("id", i + 1), "params": params, "prompt": params.get("prompt"),
+                              "steps": params.get("num_inference_steps"), "length": params.get("video_length"),
+                              "repeats": params.get("repeat_generation", 1)})
+        return tasks, None
+
+
+def write_synthetic_queue(path, size, image_size, unique_images, lora_dir, rng):
+    from PIL import Image
+    images = []
+    for i in range(unique_images):
+        img = Image.effect_noise(image_size, 40 + i % 20).convert("RGB")
+        with io.BytesIO() as buffer:
+            img.save(buffer, "PNG", compress_level=1)
+            images.append(buffer.getvalue())
+
+    manifest = []
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zf:
+        for i in range(size):
+            task_id = i + 1
+            params = {
+                "prompt": " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 40))),
+                "model_type": rng.choice(MODEL_TYPES),
+                "num_inference_steps": rng.choice((4, 8, 20, 30)),
+                "video_length": rng.choice((49, 81, 121)),
+                "repeat_generation": 1,
+                "resolution": f"{image_size[0]}x{image_size[1]}",
+                "activated_loras": [os.path.join(lora_dir, name) for name in rng.sample(LORA_NAMES, rng.randint(0, 3))],
+                "image_prompt_type": "SE" if i % 2 else "S",
+            }
+            # Members are written once per task, as older exports did, even when the pixels repeat.
+            start_name = f"task{task_id}_image_start_0.png"
+            zf.writestr(start_name, images[i % unique_images])
+            params["image_start"] = [start_name]
+            if i % 2:
+                end_name = f"task{task_id}_image_end_0.png"
+                zf.writestr(end_name, images[(i + 1) % unique_images])
+                params["image_end"] = [end_name]
+            manifest.append({"id": task_id, "params": params})
+        zf.writestr("queue.json", json.dumps(manifest))
+
+
+def write_bridge_files(workdir, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(workdir, f"clip_{i:04d}.mp4")
+        with open(path, "wb") as f:
+            f.write(str(i).encode())
+        paths.append(UploadedFile(path))
+    return paths
+
+
+def run_suite(module, size, args, track_memory):
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix=f"qm_bench_{size}_")
+    previous_temp_dir = os.environ.get("GRADIO_TEMP_DIR")
+    os.environ["GRADIO_TEMP_DIR"] = os.path.join(workdir, "gradio")
+    results = {}
+
+    def measure(name, fn):
+        if track_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - baseline if track_memory else None
+        results[name] = {"seconds": elapsed, "peak_bytes": peak, "payload_bytes": module._payload_bytes(result)}
+        return result
+
+    try:
+        image_size = tuple(args.image_size)
+        stubs = HostStubs(workdir, image_size)
+        zip_path = os.path.join(workdir, "queue.zip")
+        write_synthetic_queue(zip_path, size, image_size, min(size, args.unique_images), stubs.lora_dir, rng)
+        bridge_files = write_bridge_files(workdir, args.bridge_files)
+
+        if track_memory:
+            tracemalloc.start()
+        plugin = module.QueueManagerPlugin()
+        plugin.setup_ui()
+        stubs.install(plugin)
+        state = {}
+
+        queue, *_ = measure("load_queue_file", lambda: plugin.load_queue_file(UploadedFile(zip_path), state))
+        # Loading already rendered the first page, so this is the re-render every full update pays.
+        measure("generate_table_html", lambda: plugin.generate_table_html(queue))
+
+        def action(name, param):
+            return plugin.handle_js_action(json.dumps({"action": name, "param": param, "view": 0}), queue, state, False)
+
+        measure("handle_js_action move", lambda: action("move", [0, len(queue) - 1]))
+        measure("handle_js_action remove", lambda: action("remove", len(queue) // 2))
+        measure("handle_js_action window", lambda: action("window", len(queue) // 2))
+
+        replacements = [{"find": LORA_NAMES[i], "replace": f"replacement_{i:02d}.safetensors"} for i in range(5)]
+        measure("perform_bulk_replace", lambda: plugin.perform_bulk_replace(queue, replacements))
+
+        measure("process_batch_files", lambda: plugin.process_batch_files(
+            bridge_files, 0, "Append to Queue", queue, workers=args.workers, progress=None))
+
+        measure("send_queue_to_generator", lambda: plugin.send_queue_to_generator(queue, "Replace Queue", state))
+    finally:
+        if track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if previous_temp_dir is None:
+            os.environ.pop("GRADIO_TEMP_DIR", None)
+        else:
+            os.environ["GRADIO_TEMP_DIR"] = previous_temp_dir
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def format_report(size, timings, memory):
+    lines = [f"\n== {size} tasks ==", f"{'operation':<30} {'time (ms)':>12} {'peak (MB)':>12} {'payload (KB)':>14}"]
+    for name, timing in timings.items():
+        peak = memory.get(name, {}).get("peak_bytes") if memory else None
+        peak_text = f"{peak / 1048576:.1f}" if peak is not None else "-"
+        lines.append(f"{name:<30} {timing['seconds'] * 1000:>12.1f} {peak_text:>12} {timing['payload_bytes'] / 1024:>14.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--image-size", type=int, nargs=2, default=[512, 288], metavar=("W", "H"))
+    parser.add_argument("--unique-images", type=int, default=64, help="distinct pixel payloads shared across tasks")
+    parser.add_argument("--bridge-files", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the generated queues and caches")
+    parser.add_argument("--wan2gp-root", default=os.path.dirname(os.path.dirname(PLUGIN_DIR)))
+    args = parser.parse_args()
+
+    module = load_plugin_module(os.path.abspath(args.wan2gp_root))
+    report = {}
+    for size in args.sizes:
+        timings = run_suite(module, size, args, track_memory=False)
+        memory = None if args.no_memory else run_suite(module, size, args, track_memory=True)
+        print(format_report(size, timings, memory), flush=True)
+        report[size] = {name: dict(timing, peak_bytes=(memory or {}).get(name, {}).get("peak_bytes"))
+                        for name, timing in timings.items()}
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,1696 @@ import os
 import json
 import tempfile
 import html
-import copy
 import sys
 import time
 import inspect
-from PIL import Image
+from PIL import Image, ImageOps
 import re
+import shutil
 import io
 import base64
 import glob
+import heapq
+import itertools
+import functools
+import ast
+import hashlib
+import threading
+import weakref
+import zipfile
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+def _plugin_cache_dir(*parts):
+    # Gradio always serves files from its temp dir, so caches living there can be
+    # referenced through /gradio_api/file= without touching the host's allowed_paths.
+    root = os.environ.get("GRADIO_TEMP_DIR") or os.path.join(tempfile.gettempdir(), "gradio")
+    path = os.path.join(root, "queue_editor", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _file_url(path):
+    return "/gradio_api/file=" + os.path.abspath(path).replace("\\", "/")
+
+
+def _image_digest(pil_image):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{pil_image.mode}:{pil_image.size}".encode())
+    digest.update(pil_image.tobytes())
+    return digest.hexdigest()
+
+
+class _HashingWriter:
+    """Write target that SHA-1 hashes everything passing through, optionally forwarding it."""
+
+    def __init__(self, dst=None):
+        self._sha1 = hashlib.sha1()
+        self._dst = dst
+
+    def write(self, chunk):
+        self._sha1.update(chunk)
+        if self._dst is not None:
+            self._dst.write(chunk)
+        return len(chunk)
+
+    def hexdigest(self):
+        return self._sha1.hexdigest()
+
+
+def _member_sha1(archive, member):
+    sink = _HashingWriter()
+    archive.copy_member(member, sink)
+    return sink.hexdigest()
+
+
+class DiskLRUCache:
+    """Directory of cache files with LRU eviction by total size, shared across sessions."""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+        files = []
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                st = entry.stat()
+                files.append((st.st_mtime, entry.name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _lookup(self, name):
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return self._path(name)
+            self.misses += 1
+            return None
+
+    def _store(self, name, data):
+        path = self._path(name)
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                return path
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = len(data)
+                self._total_bytes += len(data)
+            self._evict(keep=name)
+        return path
+
+    def _discard(self, name):
+        with self._lock:
+            size = self._entries.pop(name, None)
+            if size is not None:
+                self._total_bytes -= size
+
+    def _pinned(self):
+        return ()
+
+    def _evict(self, keep=None):
+        if self._total_bytes <= self.max_bytes:
+            return
+        pinned = self._pinned()
+        for name in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if name == keep or name in pinned:
+                continue
+            self._total_bytes -= self._entries.pop(name)
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._total_bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+class ThumbnailStore(DiskLRUCache):
+    """Content-addressed on-disk JPEG cache served through Gradio's file route."""
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, max_side=256, quality=70):
+        super().__init__(cache_dir, max_bytes)
+        self.max_side = max_side
+        self.quality = quality
+
+    def _name_from_url(self, url):
+        if not url or not url.startswith("/gradio_api/file="):
+            return None
+        path = url[len("/gradio_api/file="):]
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.cache_dir):
+            return None
+        return os.path.basename(path)
+
+    def contains(self, url):
+        """Marks a served thumbnail as recently used; False if it was evicted or is not ours."""
+        name = self._name_from_url(url)
+        if name is None:
+            return True
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                return True
+        return False
+
+    def url_for_image(self, pil_image, cache_key=None):
+        """Thumbnails are named by pixel hash, or by cache_key when the caller already has a stable identity."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{self.max_side}:{self.quality}:".encode())
+        if cache_key is not None:
+            digest.update(repr(cache_key).encode())
+        else:
+            digest.update(f"{pil_image.mode}:{pil_image.size}".encode())
+            digest.update(pil_image.tobytes())
+        name = digest.hexdigest() + ".jpg"
+        path = self._lookup(name)
+        if path:
+            return _file_url(path)
+
+        thumb = pil_image.copy() if max(pil_image.size) > self.max_side else pil_image
+        if thumb is not pil_image:
+            thumb.thumbnail((self.max_side, self.max_side))
+        if thumb.mode not in ("RGB", "L"):
+            thumb = thumb.convert("RGB")
+        with io.BytesIO() as buffer:
+            thumb.save(buffer, format="jpeg", quality=self.quality)
+            return _file_url(self._store(name, buffer.getvalue()))
+
+    def url_for_data_uri(self, uri):
+        if not isinstance(uri, str) or not uri.startswith("data:image/"):
+            return uri
+        header, _, payload = uri.partition(",")
+        ext = header[len("data:image/"):].split(";")[0] or "jpeg"
+        data = base64.b64decode(payload)
+        name = hashlib.blake2b(data, digest_size=16).hexdigest() + "." + ("jpg" if ext == "jpeg" else ext)
+        return _file_url(self._store(name, data))
+
+
+class FrameCache(DiskLRUCache):
+    """Lossless on-disk cache of frames pulled from source media, keyed by file identity and position."""
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def _name(key):
+        return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest() + ".png"
+
+    def get(self, key):
+        name = self._name(key)
+        path = self._lookup(name)
+        if not path:
+            return None
+        try:
+            with Image.open(path) as img:
+                img.load()
+                return img.copy()
+        except Exception:
+            self._discard(name)
+            return None
+
+    def put(self, key, image):
+        with io.BytesIO() as buffer:
+            image.save(buffer, format="png", compress_level=1)
+            self._store(self._name(key), buffer.getvalue())
+
+
+class DecodedImageCache:
+    """Bounded LRU of decoded PIL images, sized by their raw pixel footprint."""
+
+    def __init__(self, max_bytes=768 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+    @staticmethod
+    def _image_bytes(image):
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, key):
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = image
+            self._total_bytes += self._image_bytes(image)
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= self._image_bytes(evicted)
+            return image
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._total_bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+# Everything that may hold blob refs: editor queues (with their journals), running exports and
+# the leases of handlers whose new tasks are not in a queue yet. Keyed by id, as queues are lists.
+_blob_holders = weakref.WeakValueDictionary()
+
+
+def _hold_blobs(holder):
+    _blob_holders[id(holder)] = holder
+
+
+def _value_blob_refs(value):
+    for v in value if isinstance(value, list) else (value,):
+        if ImageBlobStore.is_ref(v):
+            yield v
+
+
+def _param_blob_refs(params):
+    for key in LazyQueueArchive.image_keys:
+        yield from _value_blob_refs(params.get(key))
+
+
+class _BlobLease:
+    def __init__(self):
+        self.refs = set()
+
+    def blob_refs(self):
+        return list(self.refs)
+
+
+class _BlobRefs:
+    """Set-like view of the references an ImageBlobStore can currently resolve."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __contains__(self, ref):
+        return ImageBlobStore.is_ref(ref) and self._store._name(ref) in self._store._entries
+
+    def __len__(self):
+        return len(self._store._entries)
+
+
+class ImageBlobStore(DiskLRUCache):
+    """Content-addressed PNG store, read like a LazyQueueArchive, holding editor tasks' images."""
+
+    key = "qm-blobs"
+    prefix = "qmblob:"
+
+    def __init__(self, cache_dir, max_bytes=4 * 1024 * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes)
+        self._known = {}
+        self._content = {}
+        self._local = threading.local()
+        self.members = _BlobRefs(self)
+
+    @classmethod
+    def is_ref(cls, value):
+        return isinstance(value, str) and value.startswith(cls.prefix)
+
+    def _name(self, ref):
+        return ref[len(self.prefix):]
+
+    def _pinned(self):
+        # Only blobs no live task refers to, such as those left by earlier sessions, are evicted.
+        refs = set()
+        for holder_ref in _blob_holders.valuerefs():
+            holder = holder_ref()
+            if holder is not None:
+                refs.update(holder.blob_refs())
+        return {self._name(ref) for ref in refs}
+
+    @contextmanager
+    def holding(self):
+        """Pins the blobs this thread puts until the block ends; nested blocks share the outer lease."""
+        if getattr(self._local, 'lease', None) is not None:
+            yield
+            return
+        lease = self._local.lease = _BlobLease()
+        _hold_blobs(lease)
+        try:
+            yield
+        finally:
+            self._local.lease = None
+
+    def hold(self, refs):
+        lease = getattr(self._local, 'lease', None)
+        if lease is not None:
+            lease.refs.update(refs)
+
+    def _remember(self, pil_image, ref):
+        # Images this store produced or already stored are recognised by identity, so putting
+        # a materialised image back (the usual edit round trip) costs no hashing or encoding.
+        oid = id(pil_image)
+        def forget(wr, oid=oid):
+            with self._lock:
+                if self._known.get(oid, (None,))[0] is wr:
+                    del self._known[oid]
+        with self._lock:
+            self._known[oid] = (weakref.ref(pil_image, forget), ref)
+
+    def put(self, pil_image):
+        with self._lock:
+            known = self._known.get(id(pil_image))
+        if known and known[0]() is pil_image:
+            ref = known[1]
+        else:
+            ref = f"{self.prefix}{_image_digest(pil_image)}.png"
+        self.hold((ref,))
+        # A known image whose blob was evicted since is simply stored again.
+        if self._lookup(self._name(ref)) is None:
+            with io.BytesIO() as buffer:
+                pil_image.save(buffer, "PNG", compress_level=1)
+                self._store(self._name(ref), buffer.getvalue())
+        self._remember(pil_image, ref)
+        return ref
+
+    def member_digest(self, ref):
+        return ("blob", ref)
+
+    def canonical(self, ref):
+        return ref
+
+    def content_digest(self, ref):
+        with self._lock:
+            digest = self._content.get(ref)
+        if digest is None:
+            digest = _member_sha1(self, ref)
+            with self._lock:
+                self._content[ref] = digest
+        return digest
+
+    def open_image(self, ref):
+        path = self._lookup(self._name(ref))
+        if path is None:
+            raise FileNotFoundError(f"Image {ref} is no longer in the blob store")
+        with Image.open(path) as img:
+            img.load()
+        self._remember(img, ref)
+        return img
+
+    def copy_member(self, ref, dst):
+        with open(self._path(self._name(ref)), "rb") as src:
+            while chunk := src.read(1024 * 1024):
+                dst.write(chunk)
+
+    def close(self):
+        pass
+
+
+class LazyQueueArchive:
+    """Reads a queue.zip manifest up front and decodes member files only on request."""
+
+    image_keys = ("image_start", "image_end", "image_refs", "image_guide", "image_mask")
+    video_keys = ("video_guide", "video_mask", "video_source", "audio_guide", "audio_guide2", "audio_source")
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(path)
+        self.members = set(self._zip.namelist())
+        if "queue.json" not in self.members:
+            self._zip.close()
+            raise ValueError("queue.json not found in zip file")
+        with self._zip.open("queue.json") as f:
+            self.manifest = json.load(f)
+        if not isinstance(self.manifest, list):
+            self._zip.close()
+            raise ValueError("queue.json does not contain a task list")
+        st = os.stat(path)
+        self.key = hashlib.blake2b(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}".encode(), digest_size=8).hexdigest()
+
+        self._digests = {}
+        self._content = {}
+        self._canonical = {}
+        self._candidates = {}
+        for info in self._zip.infolist():
+            if info.is_dir() or info.filename == "queue.json":
+                continue
+            digest = ("zip", info.CRC, info.file_size, os.path.splitext(info.filename)[1].lower())
+            self._digests[info.filename] = digest
+            self._candidates.setdefault(digest, []).append(info.filename)
+
+    @property
+    def duplicates(self):
+        with self._lock:
+            return sum(1 for member, canonical in self._canonical.items() if member != canonical)
+
+    def canonical(self, member):
+        """The first member with the same bytes as this one; only candidates are ever hashed."""
+        with self._lock:
+            canonical = self._canonical.get(member)
+        if canonical is not None:
+            return canonical
+        candidates = self._candidates.get(self._digests.get(member), ())
+        canonical = member
+        if len(candidates) > 1:
+            content = self.content_digest(member)
+            canonical = next(m for m in candidates if m == member or self.content_digest(m) == content)
+        with self._lock:
+            self._canonical[member] = canonical
+        return canonical
+
+    def member_digest(self, member):
+        """Cheap identity from the zip directory; equal digests still need content_digest to match."""
+        return self._digests.get(member, (self.key, member))
+
+    def content_digest(self, member):
+        with self._lock:
+            digest = self._content.get(member)
+        if digest is None:
+            digest = _member_sha1(self, member)
+            with self._lock:
+                self._content[member] = digest
+        return digest
+
+    def read(self, member):
+        with self._lock:
+            return self._zip.read(member)
+
+    def open_image(self, member):
+        with Image.open(io.BytesIO(self.read(member))) as img:
+            img.load()
+            return ImageOps.exif_transpose(img).convert("RGB")
+
+    def extract(self, member):
+        member = self.canonical(member)
+        target = os.path.join(_plugin_cache_dir("archives", self.key), os.path.basename(member))
+        if not os.path.exists(target):
+            tmp_path = f"{target}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as dst:
+                self.copy_member(member, dst)
+            os.replace(tmp_path, target)
+        return target
+
+    def copy_member(self, member, dst):
+        with self._lock:
+            with self._zip.open(member) as src:
+                while chunk := src.read(1024 * 1024):
+                    dst.write(chunk)
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
+
+    def build_tasks(self):
+        tasks = []
+        for task_index, entry in enumerate(self.manifest):
+            if not isinstance(entry, dict):
+                continue
+            params = dict(entry.get('params', {}))
+            params.pop('state', None)
+            for key in self.image_keys:
+                value = params.get(key)
+                if value is None:
+                    continue
+                names = value if isinstance(value, list) else [value]
+                names = [name for name in names if isinstance(name, str) and name in self.members]
+                if not names:
+                    params.pop(key, None)
+                elif not isinstance(value, list):
+                    params[key] = names[0]
+                else:
+                    params[key] = names
+            for key in self.video_keys:
+                value = params.get(key)
+                if isinstance(value, str) and value not in self.members:
+                    params.pop(key, None)
+
+            tasks.append({
+                "id": entry.get('id', task_index + 1),
+                "params": params,
+                "repeats": params.get('repeat_generation', 1),
+                "length": params.get('video_length'),
+                "steps": params.get('num_inference_steps'),
+                "prompt": params.get('prompt'),
+                "start_image_labels": [],
+                "end_image_labels": [],
+                "start_image_data_base64": None,
+                "end_image_data_base64": None,
+                "_qm_source": self.key,
+            })
+        return tasks
+
+
+def _value_fingerprint(value):
+    """Comparable stand-in for a params value; images and arrays are identified by content."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_value_fingerprint(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _value_fingerprint(v)) for k, v in value.items()))
+    if isinstance(value, Image.Image):
+        return _image_digest(value)
+    if hasattr(value, "tobytes"):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{type(value).__name__}:{getattr(value, 'shape', '')}:{getattr(value, 'dtype', '')}".encode())
+        digest.update(value.tobytes())
+        return digest.hexdigest()
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def _json_default(value):
+    # Anything the manifest cannot represent (stray PIL images, tensors, callables) is dropped.
+    return None
+
+
+class QueueZipWriter:
+    """Streams tasks into a queue.zip in the layout the host's _parse_queue_zip reads, each distinct payload once."""
+
+    def __init__(self, path, get_archive):
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self._get_archive = get_archive
+        self._manifest = []
+        self._names = set()
+        self._written = {}
+        self._copied = {}
+        self._image_keys = {}
+        self.deduplicated = 0
+
+    def _unique_name(self, name):
+        base, ext = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate in self._names:
+            candidate = f"{base}_{n}{ext}"
+            n += 1
+        self._names.add(candidate)
+        return candidate
+
+    def _copy_member(self, archive, member, name):
+        # Members already encoded in the source archive (PNG frames, videos) are copied
+        # byte for byte rather than decoded and re-encoded. Their size is not known up front,
+        # so the entry is written with zip64 headers in case it exceeds 2 GiB.
+        with self._zip.open(zipfile.ZipInfo(name, time.localtime()[:6]), "w", force_zip64=True) as dst:
+            sink = _HashingWriter(dst)
+            archive.copy_member(member, sink)
+        return sink.hexdigest()
+
+    def _write_member(self, archive, member, name):
+        # Copies already written under the same directory digest are only reused when they are
+        # the same member or their bytes match; the copies were hashed while being written, so
+        # at most this member is read.
+        copies = self._copied.setdefault(archive.member_digest(member), [])
+        for written_archive, written_member, _, written_name in copies:
+            if written_archive is archive and written_member == member:
+                self.deduplicated += 1
+                return written_name
+        if copies:
+            content = archive.content_digest(member)
+            for _, _, written_content, written_name in copies:
+                if written_content == content:
+                    self.deduplicated += 1
+                    return written_name
+        name = self._unique_name(name)
+        copies.append((archive, member, self._copy_member(archive, member, name), name))
+        return name
+
+    def _write_image(self, task_id, key, index, value, archive):
+        if ImageBlobStore.is_ref(value):
+            archive = self._get_archive(ImageBlobStore.key)
+        if isinstance(value, str) and archive and value in archive.members:
+            return self._write_member(archive, value, f"task{task_id}_{key}_{index}{os.path.splitext(value)[1] or '.png'}")
+
+        if isinstance(value, Image.Image):
+            # Hash each image object once; clones of a template share the objects themselves.
+            known = self._image_keys.get(id(value))
+            if known is None or known[0] is not value:
+                known = self._image_keys[id(value)] = (value, ("pixels", _image_digest(value)))
+            written_key = known[1]
+            if written_key in self._written:
+                self.deduplicated += 1
+            else:
+                name = self._unique_name(f"task{task_id}_{key}_{index}.png")
+                with io.BytesIO() as buffer:
+                    value.save(buffer, "PNG")
+                    self._zip.writestr(name, buffer.getvalue(), compress_type=zipfile.ZIP_STORED)
+                self._written[written_key] = name
+            return self._written[written_key]
+        return None
+
+    def _write_media(self, task_id, key, value, archive):
+        if not isinstance(value, str):
+            return None
+        if archive and value in archive.members:
+            return self._write_member(archive, value, f"task{task_id}_{key}_{os.path.basename(value)}")
+        if os.path.isfile(value):
+            written_key = os.path.abspath(value)
+            if written_key not in self._written:
+                name = self._unique_name(f"task{task_id}_{key}_{os.path.basename(value)}")
+                self._zip.write(value, name, compress_type=zipfile.ZIP_STORED)
+                self._written[written_key] = name
+            return self._written[written_key]
+        return None
+
+    def add_task(self, task_id, params, source=None):
+        archive = self._get_archive(source) if source else None
+        params_copy = dict(params)
+        params_copy.pop('state', None)
+
+        for key in LazyQueueArchive.image_keys:
+            value = params_copy.get(key)
+            if value is None:
+                continue
+            values = value if isinstance(value, list) else [value]
+            names = [self._write_image(task_id, key, i, v, archive) for i, v in enumerate(values)]
+            names = [name for name in names if name]
+            if not names:
+                params_copy.pop(key, None)
+            else:
+                params_copy[key] = names if isinstance(value, list) else names[0]
+
+        for key in LazyQueueArchive.video_keys:
+            value = params_copy.get(key)
+            if value is None:
+                continue
+            name = self._write_media(task_id, key, value, archive)
+            if name:
+                params_copy[key] = name
+            else:
+                params_copy.pop(key, None)
+
+        self._manifest.append({"id": task_id, "params": params_copy})
+
+    def close(self):
+        self._zip.writestr("queue.json", json.dumps(self._manifest, indent=4, default=_json_default))
+        self._zip.close()
+
+    def abort(self):
+        self._zip.close()
+
+
+class QueueExportJob:
+    """Background export of an editor queue to a zip, pollable for progress."""
+
+    def __init__(self, queue, path, get_archive):
+        self.path = path
+        self.total = len(queue)
+        self.done = 0
+        self.deduplicated = 0
+        self.error = None
+        self.finished = False
+        self.started = time.time()
+        self.elapsed = None
+        # Snapshot the task fields up front so edits made during the export do not race the writer.
+        self._entries = [(task.get('id'), dict(task.get('params', {})), task.get('_qm_source')) for task in queue]
+        self._get_archive = get_archive
+        self._sources = {source for _, _, source in self._entries if source}
+        self._archives = {}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        _hold_blobs(self)
+
+    def blob_refs(self):
+        for _, params, _ in self._entries or ():
+            yield from _param_blob_refs(params)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _open_sources(self):
+        # The job reads through handles of its own, so the editor closing its shared handles
+        # (it keeps only a few open) cannot cut an export off partway.
+        for source in self._sources:
+            shared = self._get_archive(source)
+            try:
+                self._archives[source] = LazyQueueArchive(shared.path) if shared is not None else None
+            except Exception as e:
+                print(f"[QueueManager] Error reopening queue archive {shared.path}: {e}")
+                self._archives[source] = None
+
+    def _archive(self, source):
+        if source in self._archives:
+            return self._archives[source]
+        return self._get_archive(source)
+
+    def _run(self):
+        writer = None
+        try:
+            self._open_sources()
+            writer = QueueZipWriter(self.path, self._archive)
+            for task_id, params, source in self._entries:
+                writer.add_task(task_id, params, source)
+                self.done += 1
+            writer.close()
+            self.deduplicated = writer.deduplicated
+        except Exception as e:
+            print(f"Error saving queue: {e}")
+            self.error = str(e)
+            if writer:
+                try:
+                    writer.abort()
+                except Exception:
+                    pass
+        finally:
+            for archive in self._archives.values():
+                if archive is not None:
+                    archive.close()
+            self._archives = {}
+            self._entries = None
+            self.elapsed = time.time() - self.started
+            self.finished = True
+
+
+class QueueShardExport:
+    """Several QueueExportJobs, one per shard, running side by side and polled as one job."""
+
+    def __init__(self, shards, directory, get_archive):
+        self.path = directory
+        self.started = time.time()
+        self.costs = [cost for _, cost in shards]
+        self.jobs = [
+            QueueExportJob(tasks, os.path.join(directory, f"queue_shard_{k}_of_{len(shards)}.zip"), get_archive)
+            for k, (tasks, _) in enumerate(shards, 1)
+        ]
+        self.total = sum(job.total for job in self.jobs)
+
+    def start(self):
+        for job in self.jobs:
+            job.start()
+        return self
+
+    @property
+    def done(self):
+        return sum(job.done for job in self.jobs)
+
+    @property
+    def finished(self):
+        return all(job.finished for job in self.jobs)
+
+    @property
+    def error(self):
+        return next((job.error for job in self.jobs if job.error), None)
+
+    @property
+    def deduplicated(self):
+        return sum(job.deduplicated for job in self.jobs)
+
+    @property
+    def elapsed(self):
+        return max(job.elapsed or 0 for job in self.jobs)
+
+
+def _payload_bytes(result):
+    # What a handler sends back to the browser: HTML strings, patches and gr.update values.
+    total = 0
+    for value in (result if type(result) in (tuple, list) else (result,)):
+        if isinstance(value, dict):
+            value = value.get("value")
+        if isinstance(value, str):
+            total += len(value.encode("utf-8"))
+    return total
+
+
+class HotPathStats:
+    """Per-operation ring buffers of timing samples with percentile summaries."""
+
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._samples = OrderedDict()
+
+    def record(self, op, seconds, payload_bytes=0):
+        with self._lock:
+            samples = self._samples.get(op)
+            if samples is None:
+                samples = self._samples[op] = deque(maxlen=self.capacity)
+            samples.append((time.time(), seconds, payload_bytes))
+
+    @contextmanager
+    def span(self, op):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(op, time.perf_counter() - start)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self.started = time.time()
+
+    @staticmethod
+    def _percentile(ordered, fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        with self._lock:
+            snapshot = {op: list(samples) for op, samples in self._samples.items()}
+        result = {}
+        for op, samples in snapshot.items():
+            durations = sorted(seconds for _, seconds, _ in samples)
+            result[op] = {
+                "count": len(samples),
+                "p50_ms": self._percentile(durations, 0.5) * 1000,
+                "p90_ms": self._percentile(durations, 0.9) * 1000,
+                "p99_ms": self._percentile(durations, 0.99) * 1000,
+                "max_ms": durations[-1] * 1000,
+                "total_ms": sum(durations) * 1000,
+                "avg_bytes": sum(size for _, _, size in samples) / len(samples),
+            }
+        return result
+
+    def to_json(self):
+        with self._lock:
+            samples = {op: [{"t": t, "ms": seconds * 1000, "bytes": size} for t, seconds, size in buffer]
+                       for op, buffer in self._samples.items()}
+        return json.dumps({"started": self.started, "capacity": self.capacity,
+                           "summary": self.summary(), "samples": samples}, indent=2)
+
+
+def _holding_blobs(fn):
+    """Pins the blobs the wrapped handler stores until the queue it returns holds them."""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with self.blob_store.holding() if self.blob_store else nullcontext():
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+
+def _instrumented(op, detail=None):
+    """Records the wrapped handler's wall time and response size in ``self.stats``."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            name = op
+            if detail is not None:
+                try:
+                    name = f"{op}:{detail(*args, **kwargs)}"
+                except Exception:
+                    name = f"{op}:?"
+            start = time.perf_counter()
+            result = None
+            try:
+                result = fn(self, *args, **kwargs)
+                return result
+            finally:
+                self.stats.record(name, time.perf_counter() - start, _payload_bytes(result))
+        return wrapper
+    return decorate
+
+
+def _js_action_name(action_json, *args, **kwargs):
+    return json.loads(action_json).get("action") if action_json else "none"
+
+
+class TaskCostModel:
+    """Estimated generation time of a task in seconds, calibrated from runs the editor has watched."""
+
+    default_rate = 3e-7
+    lora_overhead = 0.05
+    default_pixels = 832 * 480
+    max_observations = 500
+
+    def __init__(self, path=None):
+        self.path = path
+        self.version = 0
+        self._lock = threading.Lock()
+        self._observations = deque(maxlen=self.max_observations)
+        self._rates = {}
+        self._global_rate = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._observations.extend(tuple(o) for o in json.load(f))
+                self._refit()
+            except Exception as e:
+                print(f"[QueueManager] Warning: Could not read cost calibration: {e}")
+
+    @staticmethod
+    def _number(value, default):
+        try:
+            return max(float(value), 1.0)
+        except (TypeError, ValueError):
+            return default
+
+    def _pixels(self, resolution):
+        match = re.match(r"\s*(\d+)\s*[x*]\s*(\d+)", str(resolution or ""))
+        return int(match.group(1)) * int(match.group(2)) if match else self.default_pixels
+
+    def units(self, params):
+        loras = params.get('activated_loras') or []
+        return (self._number(params.get('num_inference_steps'), 30.0)
+                * self._number(params.get('video_length'), 81.0)
+                * self._pixels(params.get('resolution'))
+                * self._number(params.get('repeat_generation'), 1.0)
+                * (1 + self.lora_overhead * (len(loras) if isinstance(loras, list) else 0)))
+
+    def estimate(self, params):
+        rate = self._rates.get(params.get('model_type')) or self._global_rate or self.default_rate
+        return self.units(params) * rate
+
+    def observe(self, params, seconds):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._observations.append((params.get('model_type'), self.units(params), seconds))
+            self._refit()
+            observations = list(self._observations)
+        self._save(observations)
+
+    def reset(self):
+        with self._lock:
+            self._observations.clear()
+            self._refit()
+        self._save([])
+
+    def _refit(self):
+        totals = {}
+        for model_type, units, seconds in self._observations:
+            total = totals.setdefault(model_type, [0.0, 0.0])
+            total[0] += seconds
+            total[1] += units
+        self._rates = {model_type: s / u for model_type, (s, u) in totals.items() if u}
+        all_units = sum(u for _, u in totals.values())
+        self._global_rate = sum(s for s, _ in totals.values()) / all_units if all_units else None
+        self.version += 1
+
+    def _save(self, observations):
+        if not self.path:
+            return
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(observations, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[QueueManager] Warning: Could not save cost calibration: {e}")
+
+    def describe(self):
+        with self._lock:
+            counts = {}
+            for model_type, _, _ in self._observations:
+                counts[model_type] = counts.get(model_type, 0) + 1
+        if not counts:
+            return "Not calibrated yet: estimates use a generic rate until the editor has watched some runs."
+        return f"Calibrated from {sum(counts.values())} run(s): " + ", ".join(f"{m or 'unknown'} ({n})" for m, n in sorted(counts.items(), key=lambda item: str(item[0])))
+
+
+def _format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class _ExpressionNamespace(dict):
+    def __missing__(self, key):
+        return None
+
+
+class _GuardedArithmetic(ast.NodeTransformer):
+    """Rewrites `**`, `*` and `%` into calls to ParamExpression.power, multiply and modulo."""
+
+    calls = {ast.Pow: "__qm_power", ast.Mult: "__qm_multiply", ast.Mod: "__qm_modulo"}
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        name = self.calls.get(type(node.op))
+        if name is None:
+            return node
+        call = ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+        return ast.copy_location(call, node)
+
+
+class ParamExpression:
+    """Restricted Python expression over a task's params, plus `value` and `index`."""
+
+    max_int_bits = 4096
+    max_sequence_length = 100_000
+
+    functions = {"min": min, "max": max, "abs": abs, "round": round, "int": int, "float": float, "str": str, "len": len}
+    allowed_nodes = (
+        ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp, ast.Call, ast.Name, ast.Load,
+        ast.Constant, ast.List, ast.Tuple, ast.Subscript, ast.Slice, ast.And, ast.Or, ast.Not, ast.USub, ast.UAdd,
+        ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.Eq, ast.NotEq, ast.Lt, ast.LtE,
+        ast.Gt, ast.GtE, ast.In, ast.NotIn, ast.Is, ast.IsNot,
+    )
+
+    def __init__(self, source):
+        tree = ast.parse(source.strip(), mode="eval")
+        for node in ast.walk(tree):
+            if not isinstance(node, self.allowed_nodes):
+                raise ValueError(f"{type(node).__name__} is not allowed in expressions")
+            if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in self.functions):
+                raise ValueError(f"only {', '.join(self.functions)} can be called")
+        self.source = source
+        tree = ast.fix_missing_locations(_GuardedArithmetic().visit(tree))
+        self._code = compile(tree, "<queue expression>", "eval")
+
+    @classmethod
+    def power(cls, base, exponent):
+        if isinstance(base, int) and isinstance(exponent, int) and abs(base) > 1 and exponent > 0:
+            if abs(base).bit_length() * exponent > cls.max_int_bits:
+                raise ValueError("power is too large")
+        return base ** exponent
+
+    @classmethod
+    def multiply(cls, a, b):
+        for sequence, count in ((a, b), (b, a)):
+            if isinstance(sequence, (str, list, tuple)) and isinstance(count, int) and len(sequence) * count > cls.max_sequence_length:
+                raise ValueError("repeated sequence is too long")
+        if isinstance(a, int) and isinstance(b, int) and abs(a).bit_length() + abs(b).bit_length() > cls.max_int_bits:
+            raise ValueError("product is too large")
+        return a * b
+
+    @classmethod
+    def modulo(cls, a, b):
+        # `%` on a string formats it, and a format width alone can ask for any amount of memory.
+        if isinstance(a, (str, bytes)):
+            raise ValueError("string formatting with % is not allowed")
+        return a % b
+
+    def __call__(self, params, **names):
+        namespace = _ExpressionNamespace(self.functions)
+        namespace.update(params)
+        namespace.update(names)
+        namespace.update(__qm_power=self.power, __qm_multiply=self.multiply, __qm_modulo=self.modulo)
+        return eval(self._code, {"__builtins__": {}}, namespace)
+
+
+class LoraIndex:
+    """Inverted index from LoRA basename to the tasks, and slots within them, that activate it."""
+
+    def __init__(self):
+        self._by_name = {}
+        self._names_by_task = {}
+
+    def add(self, task):
+        names = self._names_by_task.get(id(task))
+        if names is not None:
+            names[1] += 1
+            return
+        names = set()
+        for slot, path in enumerate(task.get('params', {}).get('activated_loras') or []):
+            if not isinstance(path, str):
+                continue
+            name = os.path.basename(path)
+            self._by_name.setdefault(name, {}).setdefault(id(task), (task, []))[1].append(slot)
+            names.add(name)
+        self._names_by_task[id(task)] = [names, 1]
+
+    def discard(self, task):
+        names = self._names_by_task.get(id(task))
+        if names is None:
+            return
+        names[1] -= 1
+        if names[1] > 0:
+            return
+        del self._names_by_task[id(task)]
+        for name in names[0]:
+            users = self._by_name.get(name)
+            if users is not None:
+                users.pop(id(task), None)
+                if not users:
+                    del self._by_name[name]
+
+    def users(self, name):
+        """(task, slots) pairs for every task activating the LoRA with this basename."""
+        return list(self._by_name.get(name, {}).values())
+
+    def names(self):
+        return sorted(self._by_name)
+
+    def task_names(self, task):
+        entry = self._names_by_task.get(id(task))
+        return entry[0] if entry else set()
+
+
+class LoraCatalog:
+    """Per-directory listing of LoRA files, rescanned only when the directory's mtime moves."""
+
+    extensions = (".safetensors", ".sft")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listings = {}
+        self._refreshing = set()
+
+    def _scan(self, lora_dir, mtime):
+        with os.scandir(lora_dir) as entries:
+            names = sorted(entry.name for entry in entries if entry.name.endswith(self.extensions) and entry.is_file())
+        with self._lock:
+            self._listings[lora_dir] = (mtime, names)
+        return names
+
+    def _scan_in_background(self, lora_dir, mtime):
+        with self._lock:
+            if lora_dir in self._refreshing:
+                return
+            self._refreshing.add(lora_dir)
+
+        def run():
+            try:
+                self._scan(lora_dir, mtime)
+            except OSError as e:
+                print(f"Error fetching LoRAs: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(lora_dir)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def list(self, lora_dir, background=False):
+        """LoRA names in lora_dir; with background=True a stale listing is returned while a rescan runs."""
+        try:
+            mtime = os.stat(lora_dir).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            cached = self._listings.get(lora_dir)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        if cached and background:
+            self._scan_in_background(lora_dir, mtime)
+            return cached[1]
+        return self._scan(lora_dir, mtime)
+
+    def prefetch(self, lora_dirs):
+        for lora_dir in lora_dirs:
+            try:
+                mtime = os.stat(lora_dir).st_mtime_ns
+            except OSError:
+                continue
+            with self._lock:
+                cached = self._listings.get(lora_dir)
+            if not cached or cached[0] != mtime:
+                self._scan_in_background(lora_dir, mtime)
+
+
+class PromptIndex:
+    """Inverted index from lowercased prompt words to the tasks whose prompt contains them."""
+
+    _word = re.compile(r"\w+")
+
+    def __init__(self):
+        self._by_token = {}
+        self._tokens_by_task = {}
+
+    @classmethod
+    def tokenize(cls, text):
+        return cls._word.findall(str(text or "").lower())
+
+    def add(self, task):
+        entry = self._tokens_by_task.get(id(task))
+        if entry is not None:
+            entry[1] += 1
+            return
+        tokens = frozenset(self.tokenize(task.get('prompt', task.get('params', {}).get('prompt'))))
+        for token in tokens:
+            self._by_token.setdefault(token, {})[id(task)] = task
+        self._tokens_by_task[id(task)] = [tokens, 1]
+
+    def discard(self, task):
+        entry = self._tokens_by_task.get(id(task))
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del self._tokens_by_task[id(task)]
+        for token in entry[0]:
+            tasks = self._by_token.get(token)
+            if tasks is not None:
+                tasks.pop(id(task), None)
+                if not tasks:
+                    del self._by_token[token]
+
+    def matches(self, task, terms):
+        """Whether the task's prompt has every term, the last one matching as a word prefix."""
+        tokens = self._tokens_by_task.get(id(task), (frozenset(),))[0]
+        *whole, last = terms
+        return all(term in tokens for term in whole) and any(token.startswith(last) for token in tokens)
+
+    def search(self, terms):
+        """{id(task): task} for every task matching terms, narrowing from the rarest word."""
+        *whole, last = terms
+        result = None
+        for term in sorted(set(whole), key=lambda t: len(self._by_token.get(t, ()))):
+            tasks = self._by_token.get(term, {})
+            result = dict(tasks) if result is None else {k: v for k, v in result.items() if k in tasks}
+            if not result:
+                return {}
+        prefixed = {}
+        for token, tasks in self._by_token.items():
+            if token.startswith(last):
+                prefixed.update(tasks)
+        if result is None:
+            return prefixed
+        return {k: v for k, v in result.items() if k in prefixed}
+
+
+def _sort_value(value):
+    if isinstance(value, bool) or value is None:
+        return (2, "")
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, str(value).lower())
+
+
+class QueueQuery:
+    """Filter and sort settings for the editor table."""
+
+    sort_fields = {"Steps": "steps", "Length": "length", "Repeats": "repeats", "Prompt": "prompt", "Model": "model_type", "Task Id": "id"}
+
+    def __init__(self, text="", model_type=None, lora=None, steps=(None, None), length=(None, None),
+                 start_image=None, end_image=None, sort=()):
+        self.terms = PromptIndex.tokenize(text)
+        self.model_type = model_type
+        self.lora = lora
+        self.ranges = [(field, low, high) for field, (low, high) in (("steps", steps), ("length", length))
+                       if low is not None or high is not None]
+        self.start_image = start_image
+        self.end_image = end_image
+        self.sort = list(sort)
+
+    def is_empty(self):
+        return not (self.terms or self.model_type or self.lora or self.ranges or self.sort
+                    or self.start_image is not None or self.end_image is not None)
+
+    def matches(self, task, queue, text=True):
+        params = task.get('params', {})
+        if text and self.terms and not queue.prompt_index.matches(task, self.terms):
+            return False
+        if self.model_type and params.get('model_type') != self.model_type:
+            return False
+        if self.lora and self.lora not in queue.lora_index.task_names(task):
+            return False
+        for field, low, high in self.ranges:
+            value = task.get(field)
+            if not isinstance(value, (int, float)):
+                return False
+            if (low is not None and value < low) or (high is not None and value > high):
+                return False
+        if self.start_image is not None and bool(params.get('image_start') or params.get('image_refs')) != self.start_image:
+            return False
+        if self.end_image is not None and bool(params.get('image_end')) != self.end_image:
+            return False
+        return True
+
+
+class QueueView:
+    """The queue positions a QueueQuery selects, in display order."""
+
+    def __init__(self, queue, query):
+        self.query = query
+        self._queue = queue
+        candidates = queue.prompt_index.search(query.terms).values() if query.terms else queue
+        self._matched = {id(task): task for task in candidates if query.matches(task, queue, text=False)}
+        self._positions = None
+
+    def update(self, task):
+        if self.query.matches(task, self._queue):
+            self._matched[id(task)] = task
+        else:
+            self._matched.pop(id(task), None)
+        self._positions = None
+
+    def discard(self, task):
+        self._matched.pop(id(task), None)
+        self._positions = None
+
+    def invalidate(self):
+        self._positions = None
+
+    def contains(self, task):
+        return id(task) in self._matched
+
+    def positions(self):
+        if self._positions is None:
+            queue = self._queue
+            positions = [i for i, task in enumerate(queue) if id(task) in self._matched]
+            columns = queue.columns() if self.query.sort else {}
+            # Python's sort is stable, so sorting by each key from last to first gives a multi-key order.
+            for field, descending in reversed(self.query.sort):
+                column = columns.get(field)
+                if column is not None:
+                    positions.sort(key=lambda i: _sort_value(column[i]), reverse=descending)
+                else:
+                    positions.sort(key=lambda i: _sort_value(queue[i].get('params', {}).get(field)), reverse=descending)
+            self._positions = positions
+        return self._positions
+
+    def __len__(self):
+        return len(self._matched)
+
+
+_MISSING = object()
+
+
+class QueueJournal:
+    """Undo/redo history of an EditorQueue, kept as invertible operations instead of snapshots."""
+
+    # A step is a label and a list of ("splice", index, removed_tasks, inserted_tasks) and
+    # ("params", task_id, index, {key: (old, new)}) ops. Ops find their rows by id when the
+    # recorded index no longer holds them, so steps can be replayed on a reloaded queue.
+
+    def __init__(self, limit=200):
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+
+    @staticmethod
+    def params_op(task, index, old_params, new_params, keys=None):
+        keys = set(old_params) | set(new_params) if keys is None else keys
+        changes = {}
+        for key in keys:
+            old, new = old_params.get(key, _MISSING), new_params.get(key, _MISSING)
+            if old is not new:
+                changes[key] = (old, new)
+        return ("params", task.get('id'), index, changes) if changes else None
+
+    def record(self, label, ops):
+        ops = [op for op in ops if op]
+        if ops:
+            self._undo.append((label, ops))
+            self._redo.clear()
+
+    def steps(self):
+        return list(self._undo)
+
+    @staticmethod
+    def step_blob_refs(steps):
+        for _, ops in steps:
+            for op in ops:
+                if op[0] == "params":
+                    for key, values in op[3].items():
+                        if key in LazyQueueArchive.image_keys:
+                            for value in values:
+                                yield from _value_blob_refs(value)
+                else:
+                    for task in itertools.chain(op[2], op[3]):
+                        yield from _param_blob_refs(task.get('params', {}))
+
+    def blob_refs(self):
+        return self.step_blob_refs(list(self._undo) + self._redo)
+
+    def undo(self, queue, on_params_change=None):
+        if not self._undo:
+            return None
+        label, ops = self._undo.pop()
+        for op in reversed(ops):
+            self._apply(queue, op, False, on_params_change)
+        self._redo.append((label, ops))
+        return label
+
+    def redo(self, queue, on_params_change=None):
+        if not self._redo:
+            return None
+        label, ops = self._redo.pop()
+        for op in ops:
+            self._apply(queue, op, True, on_params_change)
+        self._undo.append((label, ops))
+        return label
+
+    def replay(self, steps, queue, on_params_change=None):
+        """Re-applies steps recorded on another queue, recording them here so they can be undone."""
+        replayed = 0
+        for label, ops in steps:
+            applied = []
+            for op in ops:
+                applied.extend(self._apply(queue, op, True, on_params_change, copy_inserted=True))
+            if applied:
+                self._undo.append((label, applied))
+                replayed += 1
+        self._redo.clear()
+        return replayed
+
+    @staticmethod
+    def _locate(queue, task_id, index):
+        if 0 <= index < len(queue) and queue[index].get('id') == task_id:
+            return index
+        return queue.position(task_id)
+
+    def _apply(self, queue, op, forward, on_params_change, copy_inserted=False):
+        """Applies one operation and returns it, forward-facing, as it was applied to this queue."""
+        if op[0] == "params":
+            _, task_id, index, changes = op
+            position = self._locate(queue, task_id, index)
+            if position < 0:
+                return []
+            task = queue[position]
+            params = task['params'] = dict(task.get('params', {}))
+            applied = {}
+            for key, (old, new) in changes.items():
+                value = new if forward else old
+                applied[key] = (params.get(key, _MISSING), value)
+                if value is _MISSING:
+                    params.pop(key, None)
+                else:
+                    params[key] = value
+            if on_params_change:
+                on_params_change(task, set(changes))
+            queue.refresh(task)
+            return [("params", task_id, position, applied)]
+
+        _, index, removed, inserted = op
+        old, new = (removed, inserted) if forward else (inserted, removed)
+        if copy_inserted:
+            new = [dict(task, params=dict(task.get('params', {}))) for task in new]
+        if not old:
+            start = max(0, min(index, len(queue)))
+            queue[start:start] = new
+            return [("splice", start, [], new)]
+
+        start = self._locate(queue, old[0].get('id'), index)
+        if start >= 0 and start + len(old) <= len(queue) and all(
+            queue[start + k].get('id') == task.get('id') for k, task in enumerate(old)
+        ):
+            taken = queue[start:start + len(old)]
+            queue[start:start + len(old)] = new
+            return [("splice", start, taken, new)]
+
+        # The rows are no longer contiguous: take each one out by id and put the
+        # replacement where the first of them was.
+        positions = sorted(p for p in (queue.position(task.get('id')) for task in old) if p >= 0)
+        applied = [("splice", p, [queue[p]], []) for p in reversed(positions)]
+        for p in reversed(positions):
+            del queue[p]
+        start = positions[0] if positions else max(0, min(index, len(queue)))
+        queue[start:start] = new
+        applied.append(("splice", start, [], new))
+        return applied
+
+
+class EditorQueue(list):
+    """The editor's task list, keeping its derived indexes in step with every mutation."""
+
+    # Changing a task in place (rather than adding, removing or replacing it) must be followed
+    # by refresh(task). max_id only grows, so next_id() never reuses an id.
+
+    display_columns = ("id", "prompt", "steps", "length", "repeats")
+
+    def __init__(self, tasks=()):
+        super().__init__(tasks)
+        self.lora_index = LoraIndex()
+        self.prompt_index = PromptIndex()
+        self.view = None
+        self.journal = QueueJournal()
+        self.previous_steps = None
+        self.max_id = None
+        self._by_id = {}
+        self._positions = None
+        self._columns = None
+        self._costs = None
+        for task in self:
+            self._track(task)
+        _hold_blobs(self)
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def _track(self, task):
+        self.lora_index.add(task)
+        self.prompt_index.add(task)
+        if self.view is not None:
+            self.view.update(task)
+        task_id = task.get('id')
+        if task_id is not None:
+            self._by_id[task_id] = task
+            if isinstance(task_id, int) and (self.max_id is None or task_id > self.max_id):
+                self.max_id = task_id
+
+    def _untrack(self, task):
+        self.lora_index.discard(task)
+        self.prompt_index.discard(task)
+        if self.view is not None:
+            self.view.discard(task)
+        if self._by_id.get(task.get('id')) is task:
+            del self._by_id[task.get('id')]
+
+    def blob_refs(self):
+        for task in list(self):
+            yield from _param_blob_refs(task.get('params', {}))
+        yield from self.journal.blob_refs()
+        if self.previous_steps:
+            yield from QueueJournal.step_blob_refs(self.previous_steps)
+
+    def next_id(self, default=1):
+        if not self or self.max_id is None:
+            return default
+        return self.max_id + 1
+
+    def get_task(self, task_id):
+        return self._by_id.get(task_id)
+
+    def position(self, task_id):
+        if self._positions is None:
+            self._positions = {task.get('id'): i for i, task in enumerate(self)}
+        return self._positions.get(task_id, -1)
+
+    def columns(self):
+        """Display fields as parallel lists, so sorting and filtering never have to touch params."""
+        if self._columns is None:
+            self._columns = {name: [task.get(name) for task in self] for name in self.display_columns}
+        return self._columns
+
+    def costs(self, estimate, version):
+        """Per-task estimates and running totals in queue order, with estimates cached on the tasks."""
+        if self._costs is None or self._costs[0] != version:
+            per_task = []
+            for task in self:
+                cached = task.get('_qm_cost')
+                if cached is None or cached[0] != version:
+                    cached = task['_qm_cost'] = (version, estimate(task.get('params', {})))
+                per_task.append(cached[1])
+            self._costs = (version, per_task, list(itertools.accumulate(per_task)))
+        return self._costs[1], self._costs[2]
+
+    def _invalidate(self):
+        self._positions = None
+        self._columns = None
+        self._costs = None
+        if self.view is not None:
+            self.view.invalidate()
+
+    def set_query(self, query):
+        self.view = QueueView(self, query) if query is not None and not query.is_empty() else None
+        return self.view
+
+    def display_positions(self):
+        return self.view.positions() if self.view is not None else range(len(self))
+
+    def refresh(self, task):
+        task.pop('_qm_cost', None)
+        self._untrack(task)
+        self._track(task)
+        # An in-place edit leaves every row where it was.
+        positions = self._positions
+        self._invalidate()
+        self._positions = positions
+
+    def append(self, task):
+        self.extend([task])
+
+    def extend(self, tasks):
+        tasks = list(tasks)
+        start = len(self)
+        super().extend(tasks)
+        for i, task in enumerate(tasks, start):
+            self._track(task)
+            if self._positions is not None:
+                self._positions[task.get('id')] = i
+        if self._columns is not None:
+            for name, column in self._columns.items():
+                column.extend(task.get(name) for task in tasks)
+        self._costs = None
+        if self.view is not None:
+            self.view.invalidate()
+
+    def __iadd__(self, tasks):
+        self.extend(tasks)
+        return self
+
+    def insert(self, index, task):
+        super().insert(index, task)
+        self._track(task)
+        self._invalidate()
+
+    def pop(self, index=-1):
+        task = super().pop(index)
+        self._untrack(task)
+        self._invalidate()
+        return task
+
+    def remove(self, task):
+        super().remove(task)
+        self._untrack(task)
+        self._invalidate()
+
+    def clear(self):
+        for task in self:
+            self._untrack(task)
+        super().clear()
+        self.max_id = None
+        self._invalidate()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._invalidate()
+
+    def reverse(self):
+        super().reverse()
+        self._invalidate()
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            old, value = self[index], list(value)
+        else:
+            old, value = [self[index]], value
+        super().__setitem__(index, value)
+        for task in old:
+            self._untrack(task)
+        for task in (value if isinstance(index, slice) else [value]):
+            self._track(task)
+        self._invalidate()
+
+    def __delitem__(self, index):
+        old = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        for task in old:
+            self._untrack(task)
+        self._invalidate()
+
 
 class QueueManagerPlugin(WAN2GPPlugin):
+    bulk_edit_fields = [
+        "num_inference_steps", "video_length", "repeat_generation", "resolution", "seed",
+        "guidance_scale", "flow_shift", "prompt", "negative_prompt",
+    ]
+    preview_param_keys = ("image_start", "image_end", "image_refs", "video_source", "image_prompt_type")
+    preview_side_keys = {
+        "start": {"image_start", "image_refs", "video_source", "image_prompt_type"},
+        "end": {"image_end", "image_prompt_type"},
+    }
+
     def __init__(self):
         super().__init__()
         self.qm_apply_btn = None
@@ -55,7 +1734,51 @@ class QueueManagerPlugin(WAN2GPPlugin):
         self.captured_data = {}
         self.all_known_inputs = []
 
+        self.table_patch = None
+        self._row_cache = OrderedDict()
+        self._row_cache_size = 4096
+        self._row_cache_lock = threading.Lock()
+        self._patch_seq = itertools.count(1)
+        self._render_rev = itertools.count(1)
+        self.thumbnail_store = None
+        self.frame_cache = None
+        self.blob_store = None
+        self.image_cache = DecodedImageCache()
+        self.stats = HotPathStats()
+        self._archive_paths = {}
+        self._open_archives = OrderedDict()
+        self._max_open_archives = 8
+        self._export_jobs = {}
+        self._lora_dirs = {}
+        self.lora_catalog = LoraCatalog()
+        self.cost_model = TaskCostModel()
+        self._archive_lock = threading.RLock()
+        self.export_retention_count = 5
+        self.export_retention_hours = 24
+
+        self.table_window_threshold = 200
+        self.table_window_rows = 60
+        self.table_window_overscan = 20
+        self.table_row_height = 100
+
     def setup_ui(self):
+        try:
+            self.thumbnail_store = ThumbnailStore(_plugin_cache_dir("thumbnails"))
+        except Exception as e:
+            print(f"[QueueManager] Thumbnail cache unavailable, falling back to inline images: {e}")
+        try:
+            self.frame_cache = FrameCache(_plugin_cache_dir("frames"))
+        except Exception as e:
+            print(f"[QueueManager] Frame cache unavailable, frames will be extracted every time: {e}")
+        try:
+            self.blob_store = ImageBlobStore(_plugin_cache_dir("blobs"))
+        except Exception as e:
+            print(f"[QueueManager] Image store unavailable, tasks will keep decoded images in memory: {e}")
+        try:
+            self.cost_model = TaskCostModel(os.path.join(_plugin_cache_dir("cost_model"), "observations.json"))
+        except Exception as e:
+            print(f"[QueueManager] Cost calibration unavailable, estimates will not be saved: {e}")
+
         self.add_tab(
             tab_id="queue_manager_tab",
             label="Queue Editor",
@@ -64,7 +1787,6 @@ class QueueManagerPlugin(WAN2GPPlugin):
         )
 
         self.request_global("_parse_queue_zip")
-        self.request_global("_save_queue_to_zip")
         self.request_global("get_gen_info")
         self.request_global("update_queue_data")
         self.request_global("global_queue_ref")
@@ -140,18 +1862,292 @@ class QueueManagerPlugin(WAN2GPPlugin):
             const textarea = inputContainer.querySelector("textarea");
             if (!textarea) return;
 
-            textarea.value = JSON.stringify({action: action, param: param});
+            const tbody = document.querySelector('#qm_queue_display .qm-table tbody.qm-rows');
+            const view = tbody ? parseInt(tbody.dataset.offset || '0') : 0;
+
+            textarea.value = JSON.stringify({action: action, param: param, view: view});
             textarea.dispatchEvent(new Event("input", { bubbles: true }));
             btnContainer.click(); 
         };
-        
-        window.qmRowClick = function(e, index) {
+
+        window.qmRowIndex = function(el) {
+            const row = el.closest('tr');
+            return row ? parseInt(row.dataset.index) : -1;
+        };
+
+        window.qmRowClick = function(e, row) {
             if (window.getSelection().toString().length > 0) return;
-            window.qmHandleAction('select', index);
+            const wrapper = row.closest('.qm-wrapper');
+            if (wrapper && wrapper.classList.contains('selection-active')) {
+                window.qmHandleAction('select', window.qmRowIndex(row));
+            } else {
+                window.qmSelectRow(window.qmRowIndex(row), e);
+            }
+        };
+
+        // Multi-selection lives in the browser as absolute row indices and is only sent to
+        // the server with a batch action. Any full re-render (new data-rev) invalidates it.
+        window.qmSelection = {rows: new Set(), all: false, anchor: null, rev: null};
+
+        window.qmSelected = function() {
+            const wrapper = document.querySelector('#qm_queue_display .qm-wrapper');
+            const sel = window.qmSelection;
+            const rev = wrapper ? wrapper.dataset.rev : null;
+            if (sel.rev !== rev) {
+                sel.rows.clear();
+                sel.all = false;
+                sel.anchor = null;
+                sel.rev = rev;
+            }
+            return sel;
+        };
+
+        window.qmSyncSelection = function() {
+            const sel = window.qmSelected();
+            const wrapper = document.querySelector('#qm_queue_display .qm-wrapper');
+            if (!wrapper) return;
+            wrapper.querySelectorAll('tbody.qm-rows > tr').forEach(row => {
+                const on = sel.all || sel.rows.has(parseInt(row.dataset.index));
+                row.classList.toggle('qm-checked', on);
+                const box = row.querySelector('.qm-row-check');
+                if (box) box.checked = on;
+            });
+            const tbody = wrapper.querySelector('tbody.qm-rows');
+            const total = tbody ? parseInt(tbody.dataset.total || '0') : 0;
+            const size = sel.all ? total : sel.rows.size;
+            const all = wrapper.querySelector('.qm-check-all');
+            if (all) all.checked = total > 0 && size === total;
+            const count = wrapper.querySelector('.qm-batch-count');
+            if (count) count.textContent = size;
+            wrapper.classList.toggle('qm-has-selection', size > 0);
+        };
+
+        window.qmSelectRow = function(index, e) {
+            if (isNaN(index) || index < 0) return;
+            const sel = window.qmSelected();
+            if (sel.all) {
+                // Rows outside the rendered window are unknown here, so a row click ends "select all".
+                sel.all = false;
+                sel.rows.clear();
+            }
+            const additive = e && (e.ctrlKey || e.metaKey || (e.target && e.target.classList.contains('qm-row-check')));
+            if (e && e.shiftKey && sel.anchor !== null) {
+                if (!additive) sel.rows.clear();
+                const lo = Math.min(sel.anchor, index), hi = Math.max(sel.anchor, index);
+                for (let i = lo; i <= hi; i++) sel.rows.add(i);
+            } else if (additive) {
+                if (sel.rows.has(index)) sel.rows.delete(index); else sel.rows.add(index);
+                sel.anchor = index;
+            } else {
+                const only = sel.rows.size === 1 && sel.rows.has(index);
+                sel.rows.clear();
+                if (!only) sel.rows.add(index);
+                sel.anchor = index;
+            }
+            window.qmSyncSelection();
+        };
+
+        window.qmSelectAll = function(checked) {
+            const sel = window.qmSelected();
+            sel.rows.clear();
+            sel.anchor = null;
+            // "All" means every row the table shows, including filtered-out or unrendered ones
+            // the browser has no index for, so it is resolved on the server.
+            sel.all = !!checked;
+            window.qmSyncSelection();
+        };
+
+        window.qmBatchAction = function(action, extra) {
+            const sel = window.qmSelected();
+            const rows = Array.from(sel.rows).sort((a, b) => a - b);
+            const tbody = document.querySelector('#qm_queue_display .qm-table tbody.qm-rows');
+            const count = sel.all ? parseInt(tbody ? tbody.dataset.total || '0' : '0') : rows.length;
+            if (!count) return;
+            const param = Object.assign(sel.all ? {all: true} : {rows: rows}, extra || {});
+            if (action === 'remove_many' && count > 1 && !confirm(`Remove ${count} tasks from the queue?`)) return;
+            if (action === 'set_repeats') {
+                const value = prompt(`Repeats for ${count} selected task(s):`, '1');
+                if (value === null) return;
+                param.value = parseInt(value);
+                if (!(param.value >= 1)) return;
+            }
+            if (action === 'move_block' && param.to === undefined) {
+                const value = prompt('Move the selected tasks before row number:', '1');
+                if (value === null) return;
+                param.to = parseInt(value) - 1;
+                if (isNaN(param.to)) return;
+            }
+            window.qmHandleAction(action, param);
+        };
+
+        window.qmOnTableScroll = function(scroller) {
+            clearTimeout(window.qmScrollTimer);
+            window.qmScrollTimer = setTimeout(() => window.qmEnsureWindow(scroller), 80);
+        };
+
+        window.qmEnsureWindow = function(scroller) {
+            scroller = scroller || document.querySelector('#qm_queue_display .qm-scroll');
+            if (!scroller) return;
+            const tbody = scroller.querySelector('tbody.qm-rows');
+            if (!tbody || tbody.dataset.windowed !== '1') return;
+
+            const rowHeight = parseFloat(tbody.dataset.rowHeight);
+            const overscan = parseInt(tbody.dataset.overscan);
+            const offset = parseInt(tbody.dataset.offset);
+            const total = parseInt(tbody.dataset.total);
+            const count = tbody.children.length;
+            const first = Math.floor(scroller.scrollTop / rowHeight);
+            const last = Math.min(total, first + Math.ceil(scroller.clientHeight / rowHeight) + 1);
+            const margin = Math.floor(overscan / 2);
+
+            const needTop = offset > 0 && first - offset < margin;
+            const needBottom = offset + count < total && offset + count - last < margin;
+            if (!needTop && !needBottom) return;
+
+            const start = Math.max(0, first - overscan);
+            if (window.qmPendingWindow === start) return;
+            window.qmPendingWindow = start;
+            window.qmHandleAction('window', start);
+        };
+
+        window.qmApplyPatch = function(patchJson) {
+            if (!patchJson) return;
+            let patch;
+            try { patch = JSON.parse(patchJson); } catch (err) { return; }
+
+            const tbody = document.querySelector('#qm_queue_display .qm-table tbody.qm-rows');
+            if (!tbody) {
+                window.qmHandleAction('refresh', null);
+                return;
+            }
+            const wrapper = tbody.closest('.qm-wrapper');
+            const windowed = tbody.dataset.windowed === '1';
+            // Filtered views keep the absolute queue index the server rendered on each row.
+            const filtered = tbody.dataset.view === '1';
+            let offset = parseInt(tbody.dataset.offset || '0');
+            let total = parseInt(tbody.dataset.total || '0');
+            let etaBase = null;
+
+            for (const op of patch.ops) {
+                const rows = tbody.children;
+                const local = op.index - offset;
+                if (op.op === 'refresh') {
+                    window.qmHandleAction('refresh', null);
+                    return;
+                } else if (op.op === 'window') {
+                    tbody.innerHTML = op.html;
+                    offset = op.start;
+                    window.qmPendingWindow = null;
+                } else if (op.op === 'remove') {
+                    window.qmSelected().rows.clear();
+                    if (local < 0) offset -= 1;
+                    else if (rows[local]) rows[local].remove();
+                    total -= 1;
+                } else if (op.op === 'move') {
+                    window.qmSelected().rows.clear();
+                    const row = rows[op.from - offset];
+                    if (!row) continue;
+                    row.remove();
+                    tbody.insertBefore(row, tbody.children[op.to - offset] || null);
+                } else if (op.op === 'replace') {
+                    const target = filtered ? tbody.querySelector(`tr[data-index="${op.index}"]`) : rows[local];
+                    if (!target) continue;
+                    const tmp = document.createElement('tbody');
+                    tmp.innerHTML = op.html;
+                    Array.from(tmp.children).forEach(r => tbody.insertBefore(r, target));
+                    target.remove();
+                } else if (op.op === 'insert') {
+                    window.qmSelected().rows.clear();
+                    const tmp = document.createElement('tbody');
+                    tmp.innerHTML = op.html;
+                    const added = tmp.childElementCount;
+                    if (local < 0) {
+                        offset += added;
+                    } else if (local < rows.length || offset + rows.length >= total) {
+                        const anchor = rows[local] || null;
+                        Array.from(tmp.children).forEach(r => tbody.insertBefore(r, anchor));
+                    }
+                    total += added;
+                } else if (op.op === 'fill') {
+                    // Rows already in the queue, fetched to top up the window at either edge.
+                    const tmp = document.createElement('tbody');
+                    tmp.innerHTML = op.html;
+                    const added = tmp.childElementCount;
+                    if (local === rows.length) {
+                        Array.from(tmp.children).forEach(r => tbody.appendChild(r));
+                    } else if (local + added === 0) {
+                        const anchor = rows[0] || null;
+                        Array.from(tmp.children).forEach(r => tbody.insertBefore(r, anchor));
+                        offset -= added;
+                    }
+                } else if (op.op === 'eta_base') {
+                    etaBase = op.cum;
+                } else if (op.op === 'select') {
+                    tbody.dataset.selected = op.index;
+                    if (wrapper) wrapper.classList.toggle('selection-active', !!op.selection_mode);
+                } else if (op.op === 'selection_mode') {
+                    if (wrapper) wrapper.classList.toggle('selection-active', !!op.enabled);
+                }
+            }
+
+            if (patch.total !== undefined) total = patch.total;
+            if (patch.eta !== undefined && wrapper) {
+                const etaTotal = wrapper.querySelector('.qm-eta-total');
+                if (etaTotal) etaTotal.textContent = patch.eta;
+            }
+            if (windowed) {
+                const maxRows = parseInt(tbody.dataset.windowRows);
+                while (tbody.children.length > maxRows) tbody.lastElementChild.remove();
+            }
+            tbody.dataset.offset = offset;
+            tbody.dataset.total = total;
+            if (etaBase !== null && tbody.firstElementChild) {
+                const first = tbody.firstElementChild;
+                first.dataset.cum = etaBase + parseFloat(first.dataset.eta || '0');
+            }
+            const selected = parseInt(tbody.dataset.selected || '-1');
+            Array.from(tbody.children).forEach((row, i) => {
+                if (!filtered) row.dataset.index = offset + i;
+                row.classList.toggle('selected-row', parseInt(row.dataset.index) === selected);
+            });
+            if (!filtered) window.qmUpdateEta(tbody, windowed);
+            window.qmSyncSelection();
+
+            if (windowed) {
+                const rowHeight = parseFloat(tbody.dataset.rowHeight);
+                const table = tbody.closest('table');
+                const padTop = table.querySelector('tbody.qm-pad-top td');
+                const padBottom = table.querySelector('tbody.qm-pad-bottom td');
+                if (padTop) padTop.style.height = (offset * rowHeight) + 'px';
+                if (padBottom) padBottom.style.height = (Math.max(0, total - offset - tbody.children.length) * rowHeight) + 'px';
+                window.qmEnsureWindow();
+            }
+        };
+
+        window.qmFormatDuration = function(seconds) {
+            const s = Math.round(seconds);
+            const h = Math.floor(s / 3600), m = Math.floor((s % 3600) / 60), r = s % 60;
+            const pad = (n) => String(n).padStart(2, '0');
+            return h ? `${h}:${pad(m)}:${pad(r)}` : `${m}:${pad(r)}`;
+        };
+
+        // Running totals of the rendered rows after a patch. Each row carries its own estimate, and a
+        // window's first row its server-computed total, so the rows before the window need not be here.
+        window.qmUpdateEta = function(tbody, windowed) {
+            const rows = Array.from(tbody.children);
+            if (!rows.length) return;
+            let sum = windowed ? parseFloat(rows[0].dataset.cum || '0') - parseFloat(rows[0].dataset.eta || '0') : 0;
+            rows.forEach(row => {
+                sum += parseFloat(row.dataset.eta || '0');
+                row.dataset.cum = sum;
+                const cell = row.querySelector('.qm-cum');
+                if (cell) cell.textContent = window.qmFormatDuration(sum);
+            });
         };
 
         window.qmDragStart = function(e) {
             window.qmDragSrcRow = e.currentTarget;
+            window.qmDragSrcIndex = parseInt(e.currentTarget.dataset.index);
             e.dataTransfer.effectAllowed = 'move';
             e.dataTransfer.setData('text/html', e.currentTarget.innerHTML);
             e.currentTarget.classList.add('drag-active');
@@ -177,18 +2173,27 @@ class QueueManagerPlugin(WAN2GPPlugin):
             e.preventDefault();
             
             const targetRow = e.currentTarget;
-            const srcRow = window.qmDragSrcRow;
             
             document.querySelectorAll('.draggable-row').forEach(row => {
                 row.classList.remove('drag-over', 'drag-active');
             });
             
-            if (srcRow && srcRow !== targetRow) {
-                const fromIndex = parseInt(srcRow.dataset.index);
-                const toIndex = parseInt(targetRow.dataset.index);
-                window.qmHandleAction('move', [fromIndex, toIndex]);
+            // Rows may have been swapped out by a window fetch while dragging, so only
+            // the absolute indices captured on the rows are trusted here.
+            const fromIndex = window.qmDragSrcIndex;
+            const toIndex = parseInt(targetRow.dataset.index);
+            const sel = window.qmSelected();
+            if (window.qmDragSrcRow && !isNaN(fromIndex) && fromIndex !== toIndex) {
+                if (sel.all || (sel.rows.size > 1 && sel.rows.has(fromIndex))) {
+                    if (!sel.all && !sel.rows.has(toIndex)) {
+                        window.qmBatchAction('move_block', {to: toIndex > fromIndex ? toIndex + 1 : toIndex});
+                    }
+                } else {
+                    window.qmHandleAction('move', [fromIndex, toIndex]);
+                }
             }
             window.qmDragSrcRow = null;
+            window.qmDragSrcIndex = null;
             return false;
         };
         
@@ -197,7 +2202,24 @@ class QueueManagerPlugin(WAN2GPPlugin):
                 row.classList.remove('drag-over', 'drag-active');
             });
             window.qmDragSrcRow = null;
+            window.qmDragSrcIndex = null;
         };
+
+        if (!window.qmUndoKeys) {
+            window.qmUndoKeys = true;
+            // Ctrl+Z / Ctrl+Shift+Z / Ctrl+Y while the editor table is on screen and no text field has focus.
+            document.addEventListener('keydown', function(e) {
+                if (!(e.ctrlKey || e.metaKey)) return;
+                const key = e.key.toLowerCase();
+                if (key !== 'z' && key !== 'y') return;
+                const display = document.getElementById('qm_queue_display');
+                if (!display || display.offsetParent === null) return;
+                const target = e.target;
+                if (target && (target.isContentEditable || ['INPUT', 'TEXTAREA', 'SELECT'].includes(target.tagName))) return;
+                e.preventDefault();
+                window.qmHandleAction(key === 'y' || e.shiftKey ? 'redo' : 'undo', null);
+            });
+        }
         """
         self.add_custom_js(js)
 
@@ -348,45 +2370,224 @@ class QueueManagerPlugin(WAN2GPPlugin):
         state["qm_intercept"] = True
         return state, str(time.time())
 
-    def _regenerate_task_previews(self, params):
+    def _load_queue_archive(self, filename):
+        try:
+            archive = LazyQueueArchive(filename)
+        except Exception as e:
+            print(f"[QueueManager] Falling back to full zip parsing: {e}")
+            return None
+        self._archive_paths[archive.key] = filename
+        self._remember_archive(archive)
+        return archive.build_tasks()
+
+    def _remember_archive(self, archive):
+        with self._archive_lock:
+            self._open_archives[archive.key] = archive
+            self._open_archives.move_to_end(archive.key)
+            while len(self._open_archives) > self._max_open_archives:
+                _, stale = self._open_archives.popitem(last=False)
+                stale.close()
+
+    def _get_archive(self, source):
+        if self.blob_store and source == self.blob_store.key:
+            return self.blob_store
+        # Export jobs call this from their own threads, several at once when writing shards.
+        with self._archive_lock:
+            archive = self._open_archives.get(source)
+            if archive is not None:
+                self._open_archives.move_to_end(source)
+                return archive
+            path = self._archive_paths.get(source)
+            if not path or not os.path.exists(path):
+                return None
+            try:
+                archive = LazyQueueArchive(path)
+            except Exception as e:
+                print(f"[QueueManager] Error reopening queue archive {path}: {e}")
+                return None
+            self._remember_archive(archive)
+            return archive
+
+    def _archive_image(self, archive, member):
+        member = archive.canonical(member)
+        key = (archive.key, member)
+        image = self.image_cache.get(key)
+        if image is None:
+            image = self.image_cache.put(key, archive.open_image(member))
+        return image
+
+    def _has_blob_refs(self, params):
+        for key in LazyQueueArchive.image_keys:
+            value = params.get(key)
+            if ImageBlobStore.is_ref(value) or (isinstance(value, list) and any(ImageBlobStore.is_ref(v) for v in value)):
+                return True
+        return False
+
+    def _resolve_image(self, archive, value):
+        if not isinstance(value, str):
+            return value
+        if ImageBlobStore.is_ref(value):
+            archive = self.blob_store
+        if archive is not None and value in archive.members:
+            return self._archive_image(archive, value)
+        return value
+
+    def _task_is_resolvable(self, task):
+        """False when a lazily loaded task's source archive was deleted or moved."""
+        source = task.get('_qm_source')
+        return not source or self._get_archive(source) is not None
+
+    def _check_resolvable(self, tasks, action):
+        # Unresolved tasks would hand raw member names to WAN2GP, or lose their images in an
+        # export, so the whole action is refused and the user told which ones.
+        missing = [str(task.get('id')) for task in tasks if not self._task_is_resolvable(task)]
+        if not missing:
+            return True
+        shown = ", ".join(missing[:10]) + (f" and {len(missing) - 10} more" if len(missing) > 10 else "")
+        gr.Warning(f"Cannot {action}: the images of task(s) {shown} are no longer available "
+                   f"(their queue file was removed). Remove those tasks first.")
+        return False
+
+    def _materialize_params(self, source, params):
+        archive = None
+        if source:
+            archive = self._get_archive(source)
+            if archive is None:
+                print("[QueueManager] Warning: Source archive for task is no longer available.")
+        if archive is None and not self._has_blob_refs(params):
+            return params
+
+        resolved = dict(params)
+        for key in LazyQueueArchive.image_keys:
+            value = resolved.get(key)
+            if isinstance(value, list):
+                resolved[key] = [self._resolve_image(archive, v) for v in value]
+            elif value is not None:
+                resolved[key] = self._resolve_image(archive, value)
+        if archive is None:
+            return resolved
+        for key in LazyQueueArchive.video_keys:
+            value = resolved.get(key)
+            if isinstance(value, str) and value in archive.members:
+                resolved[key] = archive.extract(value)
+        return resolved
+
+    def _derive_task(self, base, param_overrides=None, **overrides):
+        # Tasks share every untouched value with the task they were derived from, so params
+        # values are never mutated in place anywhere in the plugin: changes assign a new value.
+        task = dict(base)
+        params = dict(base.get('params', {}))
+        if param_overrides:
+            params.update(param_overrides)
+        task['params'] = params
+        task.pop('_qm_cost', None)
+        task.update(overrides)
+        return task
+
+    def _materialize_task(self, task):
+        source = task.get('_qm_source')
+        if not source and not self._has_blob_refs(task.get('params', {})):
+            return task
+        # Rows that were never rendered have no previews yet, and the generator's queue shows these.
+        if task.get('start_image_data_base64') is None or task.get('end_image_data_base64') is None:
+            self._ensure_lazy_previews(task)
+        params = self._materialize_params(source, task.get('params', {}))
+        materialized = {k: v for k, v in task.items() if k != '_qm_source'}
+        materialized['params'] = params
+        # The host keeps preview images as lists, even where a param holds a single image.
+        for side, value in (('start', params.get('image_start') or params.get('image_refs')), ('end', params.get('image_end'))):
+            materialized[f'{side}_image_data'] = value if value is None or isinstance(value, list) else [value]
+        return materialized
+
+    def _compact_task(self, task):
+        """Moves a task's decoded images into the blob store, leaving references in its params."""
+        if not self.blob_store:
+            return task
+        params = task.get('params', {})
+        refs = {}
+        try:
+            for key in LazyQueueArchive.image_keys:
+                value = params.get(key)
+                if isinstance(value, Image.Image):
+                    refs[key] = self.blob_store.put(value)
+                elif isinstance(value, list) and any(isinstance(v, Image.Image) for v in value):
+                    refs[key] = [self.blob_store.put(v) if isinstance(v, Image.Image) else v for v in value]
+        except Exception as e:
+            print(f"[QueueManager] Warning: Could not store task images: {e}")
+            return task
+        if refs:
+            task['params'] = dict(params, **refs)
+        task.pop('start_image_data', None)
+        task.pop('end_image_data', None)
+        return task
+
+    def _ensure_lazy_previews(self, task):
+        params = self._materialize_params(task.get('_qm_source'), task.get('params', {}))
+        preview_data = self._regenerate_task_previews(params)
+        preview_data.pop('start_image_data', None)
+        preview_data.pop('end_image_data', None)
+        task.update(preview_data)
+
+    @_instrumented("previews:regenerate")
+    def _regenerate_task_previews(self, params, sides=("start", "end")):
         start_b64, end_b64, start_labels, end_labels, start_data, end_data = [], [], [], [], None, None
         
         if hasattr(self, 'get_preview_images') and self.get_preview_images:
             try:
                 start_data, end_data, start_labels, end_labels = self.get_preview_images(params)
                 
-                convert_fn = getattr(self, 'pil_to_base64_uri', None)
-                if not convert_fn:
-                    convert_fn = self._pil_to_base64
-
-                if start_data:
-                    start_b64 = [convert_fn(img, format="jpeg", quality=70) for img in start_data]
-                if end_data:
-                    end_b64 = [convert_fn(img, format="jpeg", quality=70) for img in end_data]
+                if start_data and "start" in sides:
+                    start_b64 = [self._thumbnail_url(img) for img in start_data]
+                if end_data and "end" in sides:
+                    end_b64 = [self._thumbnail_url(img) for img in end_data]
             except Exception as e:
                 print(f"[QueueManager] Error generating previews: {e}")
         
-        return {
-            "start_image_labels": start_labels or [],
-            "end_image_labels": end_labels or [],
-            "start_image_data_base64": start_b64,
-            "end_image_data_base64": end_b64,
-            "start_image_data": start_data,
-            "end_image_data": end_data
-        }
-
+        preview_data = {}
+        if "start" in sides:
+            preview_data.update(start_image_labels=start_labels or [], start_image_data_base64=start_b64, start_image_data=start_data)
+        if "end" in sides:
+            preview_data.update(end_image_labels=end_labels or [], end_image_data_base64=end_b64, end_image_data=end_data)
+        return preview_data
+
+    def _changed_preview_keys(self, task, old_params, new_params):
+        """Compares image-bearing params against the fingerprints stored on the task and stores the new ones."""
+        stored = task.get('_qm_preview_fp') or {}
+        fingerprints, changed = {}, set()
+        for key in self.preview_param_keys:
+            new_value, old_value = new_params.get(key), old_params.get(key)
+            same = new_value is old_value or (
+                isinstance(new_value, list) and isinstance(old_value, list) and len(new_value) == len(old_value)
+                and all(a is b for a, b in zip(new_value, old_value))
+            )
+            if same and key in stored:
+                fingerprints[key] = stored[key]
+                continue
+            fingerprints[key] = _value_fingerprint(new_value)
+            if same:
+                continue
+            previous = stored[key] if key in stored else _value_fingerprint(old_value)
+            if fingerprints[key] != previous:
+                changed.add(key)
+        task['_qm_preview_fp'] = fingerprints
+        return changed
+
+    @_instrumented("post_apply_handler")
+    @_holding_blobs
     def post_apply_handler(self, state, queue, index_being_edited):
+        queue = self._editor_queue(queue)
         intercept = state.get("qm_intercept", False)
         if not intercept:
-            return [gr.update()] * 6
+            return [gr.update()] * 6 + [""]
             
         state["qm_intercept"] = False
         state["editing_task_id"] = None
         
         if index_being_edited is None or index_being_edited < 0:
-            return gr.Tabs(selected="plugin_queue_manager_tab"), queue, gr.update(), -1, gr.update(), False
+            return gr.Tabs(selected="plugin_queue_manager_tab"), queue, gr.update(), -1, gr.update(), False, ""
             
         captured = self.captured_data
+        patch_update = ""
         
         if captured and 0 <= index_being_edited < len(queue):
             orig_task = queue[index_being_edited]
@@ -395,58 +2596,62 @@ class QueueManagerPlugin(WAN2GPPlugin):
                 model_type = captured.get('model_type') or orig_task['params'].get('model_type')
                 if model_type:
                     try:
-                        lora_dir = self.get_lora_dir(model_type)
+                        lora_dir = self._lora_dir(model_type)
                         captured['activated_loras'] = self.update_loras_url_cache(lora_dir, captured['activated_loras'])
                     except Exception as e:
                         print(f"[QueueManager] Warning: Could not update lora cache: {e}")
 
-            new_params = orig_task.get('params', {}).copy()
+            old_params = orig_task.get('params', {})
+            new_params = old_params.copy()
             new_params.update(captured)
 
             orig_task['params'] = new_params
-            orig_task['prompt'] = new_params.get('prompt', orig_task.get('prompt'))
-            orig_task['steps'] = new_params.get('num_inference_steps', orig_task.get('steps'))
-            orig_task['length'] = new_params.get('video_length', orig_task.get('length'))
-            orig_task['repeats'] = new_params.get('repeat_generation', orig_task.get('repeats', 1))
-
-            preview_data = self._regenerate_task_previews(new_params)
-            orig_task.update(preview_data)
+            self._sync_task_columns(orig_task)
+
+            # Prompt or step edits leave the image inputs alone, so previews are only rebuilt for
+            # the side(s) whose images actually changed.
+            source = orig_task.get('_qm_source')
+            resolved_params = self._materialize_params(source, new_params)
+            changed = self._changed_preview_keys(orig_task, self._materialize_params(source, old_params), resolved_params)
+            sides = [side for side, keys in self.preview_side_keys.items() if keys & changed]
+            if sides:
+                orig_task.update(self._regenerate_task_previews(resolved_params, sides))
+            if self.blob_store:
+                # The replaced images are only referenced from old_params until the journal has them.
+                self.blob_store.hold(_param_blob_refs(old_params))
+            self._compact_task(orig_task)
+            # Recorded after compaction so the journal holds blob refs, not the captured pixels.
+            queue.journal.record("Edit task", [QueueJournal.params_op(orig_task, index_being_edited, old_params, orig_task['params'], captured.keys())])
 
             queue[index_being_edited] = orig_task
+            queue.refresh(orig_task)
+            patch_update = self._table_patch(queue, self._row_patch("replace", queue, index_being_edited))
             gr.Info("Queue Manager: Task updated.")
 
-        gen = self.get_gen_info(state)
-        live_queue = gen.get("queue", [])
-
-        clean_queue = [t for t in live_queue if t.get('id', 0) >= -999]
-        gen["queue"] = clean_queue
-
-        self.update_queue_data(clean_queue)
+        live_queue_html = self._update_live_queue(self._drop_temp_task(state))
         
-        html_update = self.generate_table_html(queue)
-        live_queue_html = self.update_queue_data(gen["queue"])
-        
-        return gr.Tabs(selected="plugin_queue_manager_tab"), queue, html_update, -1, live_queue_html, False
+        return gr.Tabs(selected="plugin_queue_manager_tab"), queue, gr.update(), -1, live_queue_html, False, patch_update
 
+    @_instrumented("post_add_handler")
+    @_holding_blobs
     def post_add_handler(self, state, queue):
+        queue = self._editor_queue(queue)
         intercept = state.get("qm_intercept", False)
         if not intercept:
-            return gr.Tabs(selected="plugin_queue_manager_tab"), queue, gr.update(), False, gr.update(), gr.update()
+            return gr.Tabs(selected="plugin_queue_manager_tab"), queue, gr.update(), False, gr.update(), gr.update(), ""
 
         state["qm_intercept"] = False
         captured = self.captured_data
         
         if captured:
-            new_id = 1000
-            if queue:
-                new_id = max([t.get('id', 0) for t in queue]) + 1
+            new_id = queue.next_id(default=1000)
                 
             model_type = captured.get('model_type')
             
             if 'activated_loras' in captured and self.update_loras_url_cache and self.get_lora_dir:
                 if model_type:
                     try:
-                        lora_dir = self.get_lora_dir(model_type)
+                        lora_dir = self._lora_dir(model_type)
                         captured['activated_loras'] = self.update_loras_url_cache(lora_dir, captured['activated_loras'])
                     except Exception as e:
                         print(f"[QueueManager] Warning: Could not update lora cache for add: {e}")
@@ -462,13 +2667,20 @@ class QueueManagerPlugin(WAN2GPPlugin):
                 "repeats": captured.get("repeat_generation", 1)
             }
             new_task.update(preview_data)
+            self._compact_task(new_task)
 
+            was_windowed = self._is_windowed(queue)
             queue.append(new_task)
+            queue.journal.record("Add task", [("splice", len(queue) - 1, [], [new_task])])
             gr.Info("Queue Manager: New task added.")
 
+            if len(queue) > 1 and self._is_windowed(queue) == was_windowed:
+                patch_update = self._table_patch(queue, self._row_patch("insert", queue, len(queue) - 1))
+                return gr.Tabs(selected="plugin_queue_manager_tab"), queue, gr.update(), False, gr.update(visible=True), gr.update(visible=True), patch_update
+
         html_update = self.generate_table_html(queue)
 
-        return gr.Tabs(selected="plugin_queue_manager_tab"), queue, html_update, False, gr.update(visible=True), gr.update(visible=True)
+        return gr.Tabs(selected="plugin_queue_manager_tab"), queue, html_update, False, gr.update(visible=True), gr.update(visible=True), ""
 
     def create_ui(self):
         css = """
@@ -494,6 +2706,15 @@ class QueueManagerPlugin(WAN2GPPlugin):
         .alternating-grey-row:nth-child(even) { background-color: var(--table-even-background-fill); }
         .alternating-grey-row:nth-child(odd) { background-color: transparent; }
         
+        .qm-windowed .qm-scroll { max-height: 75vh; overflow-y: auto; }
+        .qm-windowed .qm-table thead th { position: sticky; top: 0; z-index: 1; }
+        .qm-windowed .draggable-row td { height: 100px; box-sizing: border-box; padding: 4px 8px; overflow: hidden; }
+        .qm-batch-bar { display: none; align-items: center; gap: 8px; flex-wrap: wrap; padding: 6px 8px; margin-bottom: 6px; border: 1px solid var(--border-color-primary); border-radius: 4px; background: var(--background-fill-secondary); }
+        .qm-has-selection .qm-batch-bar { display: flex; }
+        .qm-batch-bar button { padding: 2px 10px; border: 1px solid var(--border-color-primary); border-radius: 4px; background: var(--background-fill-primary); cursor: pointer; }
+        .qm-batch-bar button:hover { border-color: var(--primary-500); }
+        .qm-eta-summary { margin-bottom: 6px; font-size: 0.9em; }
+        .qm-checked { background-color: rgba(59, 130, 246, 0.12) !important; }
         .selected-row { background-color: rgba(59, 130, 246, 0.2) !important; border-left: 4px solid #3b82f6; }
         /* Override cursor for selection mode */
         .selection-active .draggable-row { cursor: pointer !important; }
@@ -504,7 +2725,7 @@ class QueueManagerPlugin(WAN2GPPlugin):
         """
         
         with gr.Blocks() as demo:
-            self.queue_state = gr.State([])
+            self.queue_state = gr.State(EditorQueue())
             self.qm_editing_index = gr.State(-1) 
             self._ensure_shared_components()
 
@@ -518,8 +2739,28 @@ class QueueManagerPlugin(WAN2GPPlugin):
                 with gr.Column(scale=1):
                     gr.Markdown("### Queue Loading / Unloading")
                     self.upload_btn = gr.UploadButton("Load queue.zip / .json", file_types=[".zip", ".json"], variant="primary")
+                    with gr.Accordion("Merge Several Queues", open=False):
+                        self.merge_files = gr.File(file_count="multiple", file_types=[".zip", ".json"], label="Queue files (in order)")
+                        self.merge_policy = gr.Radio(["Concatenate", "Interleave"], value="Concatenate", label="Order")
+                        self.merge_target = gr.Radio(["Append to Current List", "Replace Current List"], value="Append to Current List", label="Action")
+                        self.merge_dedupe = gr.Checkbox(value=True, label="Skip tasks with identical parameters")
+                        self.merge_btn = gr.Button("Merge", variant="primary", size="sm")
                     self.download_btn = gr.DownloadButton("Save queue.zip", visible=False)
+                    self.export_status = gr.Markdown(visible=False)
+                    self.export_timer = gr.Timer(1.0, active=False)
+                    self.export_job_id = gr.State(None)
+                    with gr.Accordion("Split into Shards", open=False):
+                        self.shard_count = gr.Slider(2, 16, value=2, step=1, label="Generator machines")
+                        self.shard_btn = gr.Button("Export Balanced Shards", size="sm")
+                        self.shard_status = gr.Markdown(visible=False)
+                        self.shard_files = gr.File(file_count="multiple", label="Shards", visible=False)
+                        self.shard_timer = gr.Timer(1.0, active=False)
+                        self.shard_job_id = gr.State(None)
                     self.clear_btn = gr.Button("Clear Current List", variant="stop")
+                    with gr.Row():
+                        self.undo_btn = gr.Button("Undo", size="sm")
+                        self.redo_btn = gr.Button("Redo", size="sm")
+                    self.replay_btn = gr.Button("Replay Edits from Previous Queue", size="sm", visible=False)
                     
                     with gr.Column(visible=False) as self.send_group:
                         gr.Markdown("### Send to Generator")
@@ -536,6 +2777,7 @@ class QueueManagerPlugin(WAN2GPPlugin):
                         self.batch_files = gr.File(file_count="multiple", label="Input Files", visible=False)
                         with gr.Row(visible=False) as self.batch_options_row:
                             self.batch_mode = gr.Radio(["Append to Queue", "Replace Queue"], label="Action", value="Append to Queue")
+                            self.batch_workers = gr.Slider(1, 16, value=min(4, os.cpu_count() or 1), step=1, label="Extraction Workers")
                         
                         with gr.Row():
                             self.batch_btn = gr.Button("Generate", variant="primary", visible=False)
@@ -559,17 +2801,90 @@ class QueueManagerPlugin(WAN2GPPlugin):
                             self.do_replace_btn = gr.Button("Replace All", variant="primary")
                             self.cancel_replace_btn = gr.Button("Cancel", variant="stop")
 
+                    self.bulk_edit_btn = gr.Button("Bulk Edit Parameters", variant="secondary")
+
+                    with gr.Group(visible=False) as self.bulk_edit_group:
+                        gr.Markdown("#### Bulk Parameter Edit")
+                        self.bulk_edit_field = gr.Dropdown(
+                            choices=self.bulk_edit_fields, value="num_inference_steps", label="Parameter", allow_custom_value=True
+                        )
+                        with gr.Row(variant="compact"):
+                            self.bulk_edit_op = gr.Dropdown(["Set", "Add", "Multiply", "Expression"], value="Set", label="Operation", scale=1)
+                            self.bulk_edit_value = gr.Textbox(label="Value", placeholder="30, \"832x480\" or value * 2 for Expression", scale=2)
+                        self.bulk_edit_filter = gr.Textbox(label="Only tasks where (optional)", placeholder="model_type == \"t2v\" and video_length > 81")
+                        self.bulk_edit_rows = gr.Textbox(label="Rows (optional)", placeholder="e.g. 1-20, 35 (blank for all)")
+                        with gr.Row():
+                            self.do_bulk_edit_btn = gr.Button("Apply to Queue", variant="primary")
+                            self.close_bulk_edit_btn = gr.Button("Close", variant="stop")
+
+                    with gr.Accordion("Optimize Order", open=False):
+                        gr.Markdown("Groups tasks by model and LoRA set so the generator reloads them less often.")
+                        self.optimize_pinned = gr.Textbox(label="Pinned rows (optional)", placeholder="e.g. 1-3, 10 (these stay where they are)")
+                        self.optimize_group_order = gr.Radio(
+                            ["First appearance", "Cheapest groups first"], value="First appearance", label="Group order"
+                        )
+                        self.optimize_summary = gr.Markdown("")
+                        with gr.Row():
+                            self.preview_optimize_btn = gr.Button("Preview", size="sm")
+                            self.apply_optimize_btn = gr.Button("Apply", variant="primary", size="sm")
+
+                    with gr.Accordion("Cache Statistics", open=False):
+                        self.cache_stats_display = gr.Markdown(self._render_cache_stats())
+                        self.refresh_cache_stats_btn = gr.Button("Refresh", size="sm")
+
+                    with gr.Accordion("Time Estimates", open=False):
+                        self.cost_model_display = gr.Markdown(self.cost_model.describe())
+                        with gr.Row():
+                            self.refresh_cost_model_btn = gr.Button("Refresh", size="sm")
+                            self.reset_cost_model_btn = gr.Button("Forget Calibration", size="sm")
+
+                    with gr.Accordion("Diagnostics", open=False):
+                        self.diagnostics_display = gr.Markdown(self._render_diagnostics())
+                        with gr.Row():
+                            self.refresh_diagnostics_btn = gr.Button("Refresh", size="sm")
+                            self.export_diagnostics_btn = gr.Button("Export JSON", size="sm")
+                            self.reset_diagnostics_btn = gr.Button("Reset", size="sm")
+                        self.diagnostics_file = gr.File(label="Timings", visible=False)
+
                 with gr.Column(scale=3):
                     gr.Markdown("### Tasks")
-                    self.queue_display = gr.HTML(value="<div style='padding:20px; text-align:center; color:grey;'>No queue loaded. Upload a file to begin.</div>")
+                    with gr.Accordion("Search & Filter", open=False):
+                        with gr.Row(variant="compact"):
+                            self.query_text = gr.Textbox(label="Prompt contains", placeholder="words to find (Enter to search)", scale=3)
+                            self.query_model = gr.Dropdown(choices=[], value=None, label="Model", allow_custom_value=True, scale=1)
+                            self.query_lora = gr.Dropdown(choices=[], value=None, label="LoRA", allow_custom_value=True, scale=1)
+                        with gr.Row(variant="compact"):
+                            self.query_steps_min = gr.Number(value=None, label="Steps from", precision=0)
+                            self.query_steps_max = gr.Number(value=None, label="Steps to", precision=0)
+                            self.query_length_min = gr.Number(value=None, label="Length from", precision=0)
+                            self.query_length_max = gr.Number(value=None, label="Length to", precision=0)
+                        with gr.Row(variant="compact"):
+                            self.query_start_image = gr.Radio(["Any", "With", "Without"], value="Any", label="Start image")
+                            self.query_end_image = gr.Radio(["Any", "With", "Without"], value="Any", label="End image")
+                            self.query_sort = gr.Dropdown(
+                                choices=[f"{label} {arrow}" for label in QueueQuery.sort_fields for arrow in ("↑", "↓")],
+                                value=[], multiselect=True, label="Sort by (in order)"
+                            )
+                        with gr.Row():
+                            self.apply_query_btn = gr.Button("Apply", variant="primary", size="sm")
+                            self.reset_query_btn = gr.Button("Reset", size="sm")
+                        self.query_status = gr.Markdown("")
+                    self.queue_display = gr.HTML(value="<div style='padding:20px; text-align:center; color:grey;'>No queue loaded. Upload a file to begin.</div>", elem_id="qm_queue_display")
 
             self.action_input = gr.Textbox(elem_id="qm_action_input", visible=False)
             self.action_trigger = gr.Button(elem_id="qm_action_trigger", visible=False)
+            self.table_patch = gr.Textbox(elem_id="qm_table_patch", visible=False)
             self.zip_output_file = gr.File(visible=False)
 
             self.upload_btn.upload(
                 fn=self.load_queue_file,
-                inputs=[self.upload_btn, self.state],
+                inputs=[self.upload_btn, self.state, self.queue_state],
+                outputs=[self.queue_state, self.queue_display, self.download_btn, self.send_group, self.replay_btn]
+            )
+
+            self.merge_btn.click(
+                fn=self.merge_queue_files,
+                inputs=[self.merge_files, self.merge_policy, self.merge_dedupe, self.merge_target, self.queue_state, self.state],
                 outputs=[self.queue_state, self.queue_display, self.download_btn, self.send_group]
             )
 
@@ -589,25 +2904,55 @@ class QueueManagerPlugin(WAN2GPPlugin):
                     self.batch_options_row,
                     self.batch_btn,
                     self.download_btn,
-                    self.send_group
+                    self.send_group,
+                    self.table_patch
                 ]
             ).then(
                 fn=None,
                 js="(val) => { if (val && val.startsWith('edit_')) { document.getElementById('queue_action_trigger').click(); } }",
                 inputs=[self.queue_action_input]
-            )
+            ).then(**self._patch_listener())
             
             self.clear_btn.click(
-                fn=lambda: ([], "<div style='padding:20px; text-align:center; color:grey;'>List cleared.</div>", gr.update(visible=False), gr.update(visible=False)),
+                fn=self.clear_queue,
+                inputs=[self.queue_state],
                 outputs=[self.queue_state, self.queue_display, self.download_btn, self.send_group]
             )
+
+            # Undo and redo go through the JS action channel so the table re-renders at its current scroll window.
+            self.undo_btn.click(fn=None, js="() => window.qmHandleAction('undo', null)")
+            self.redo_btn.click(fn=None, js="() => window.qmHandleAction('redo', null)")
+
+            self.replay_btn.click(
+                fn=self.replay_previous_edits,
+                inputs=[self.queue_state],
+                outputs=[self.queue_state, self.queue_display, self.replay_btn]
+            )
             
             self.download_btn.click(
                 fn=self.save_current_queue,
-                inputs=[self.queue_state],
-                outputs=[self.zip_output_file]
+                inputs=[self.queue_state, self.export_job_id],
+                outputs=[self.export_job_id, self.export_status, self.export_timer]
+            )
+
+            self.export_timer.tick(
+                fn=self.poll_export_job,
+                inputs=[self.export_job_id],
+                outputs=[self.zip_output_file, self.export_status, self.export_timer, self.export_job_id]
             )
             
+            self.shard_btn.click(
+                fn=self.export_shards,
+                inputs=[self.queue_state, self.shard_count, self.shard_job_id],
+                outputs=[self.shard_job_id, self.shard_status, self.shard_timer, self.shard_files]
+            )
+
+            self.shard_timer.tick(
+                fn=self.poll_shard_export,
+                inputs=[self.shard_job_id],
+                outputs=[self.shard_files, self.shard_status, self.shard_timer, self.shard_job_id]
+            )
+
             self.zip_output_file.change(
                 fn=None,
                 js="(val) => { if (val) { const a = document.createElement('a'); a.href = val.url; a.download = val.orig_name; a.click(); } }",
@@ -617,20 +2962,20 @@ class QueueManagerPlugin(WAN2GPPlugin):
             self.bridge_btn.click(
                 fn=self.toggle_template_selection,
                 inputs=[self.queue_state],
-                outputs=[self.qm_template_selection_mode, self.queue_display, self.bridge_btn, self.batch_group, self.batch_info, self.batch_files, self.batch_options_row, self.batch_btn, self.bulk_replace_btn]
-            )
+                outputs=[self.qm_template_selection_mode, self.table_patch, self.bridge_btn, self.batch_group, self.batch_info, self.batch_files, self.batch_options_row, self.batch_btn, self.bulk_replace_btn]
+            ).then(**self._patch_listener())
             
             self.batch_cancel_btn.click(
                 fn=self.cancel_batch_operation,
                 inputs=[self.queue_state],
-                outputs=[self.qm_template_selection_mode, self.queue_display, self.bridge_btn, self.batch_group, self.bulk_replace_btn]
-            )
+                outputs=[self.qm_template_selection_mode, self.table_patch, self.bridge_btn, self.batch_group, self.bulk_replace_btn]
+            ).then(**self._patch_listener())
 
             self.batch_btn.click(
                 fn=self.process_batch_files,
-                inputs=[self.batch_files, self.qm_selected_template_idx, self.batch_mode, self.queue_state],
-                outputs=[self.queue_state, self.queue_display, self.download_btn, self.batch_group, self.bridge_btn, self.qm_template_selection_mode, self.bulk_replace_btn, self.send_group]
-            )
+                inputs=[self.batch_files, self.qm_selected_template_idx, self.batch_mode, self.queue_state, self.batch_workers],
+                outputs=[self.queue_state, self.queue_display, self.download_btn, self.batch_group, self.bridge_btn, self.qm_template_selection_mode, self.bulk_replace_btn, self.send_group, self.table_patch]
+            ).then(**self._patch_listener())
 
             self.bulk_replace_btn.click(
                 fn=self.open_bulk_replacer,
@@ -656,6 +3001,103 @@ class QueueManagerPlugin(WAN2GPPlugin):
                 outputs=[self.bulk_group, self.bridge_btn, self.bulk_replace_btn]
             )
 
+            self.bulk_edit_btn.click(
+                fn=lambda: (gr.update(visible=True), gr.update(visible=False)),
+                inputs=[],
+                outputs=[self.bulk_edit_group, self.bulk_edit_btn]
+            )
+
+            self.close_bulk_edit_btn.click(
+                fn=lambda: (gr.update(visible=False), gr.update(visible=True)),
+                inputs=[],
+                outputs=[self.bulk_edit_group, self.bulk_edit_btn]
+            )
+
+            self.do_bulk_edit_btn.click(
+                fn=self.perform_bulk_edit,
+                inputs=[self.queue_state, self.bulk_edit_field, self.bulk_edit_op, self.bulk_edit_value, self.bulk_edit_filter, self.bulk_edit_rows],
+                outputs=[self.queue_state, self.queue_display]
+            )
+
+            query_inputs = [
+                self.queue_state, self.query_text, self.query_model, self.query_lora, self.query_steps_min, self.query_steps_max,
+                self.query_length_min, self.query_length_max, self.query_start_image, self.query_end_image, self.query_sort
+            ]
+            for trigger in (self.apply_query_btn.click, self.query_text.submit):
+                trigger(
+                    fn=self.apply_queue_query,
+                    inputs=query_inputs,
+                    outputs=[self.queue_state, self.queue_display, self.query_status]
+                )
+
+            self.reset_query_btn.click(
+                fn=self.reset_queue_query,
+                inputs=[self.queue_state],
+                outputs=[self.queue_state, self.queue_display, self.query_status, self.query_text, self.query_model, self.query_lora,
+                         self.query_steps_min, self.query_steps_max, self.query_length_min, self.query_length_max,
+                         self.query_start_image, self.query_end_image, self.query_sort]
+            )
+
+            self.query_model.focus(
+                fn=lambda q: gr.update(choices=sorted({t.get('params', {}).get('model_type') for t in (q or [])} - {None})),
+                inputs=[self.queue_state],
+                outputs=[self.query_model]
+            )
+
+            self.query_lora.focus(
+                fn=lambda q: gr.update(choices=self._get_used_loras(q)),
+                inputs=[self.queue_state],
+                outputs=[self.query_lora]
+            )
+
+            self.refresh_cache_stats_btn.click(
+                fn=self._render_cache_stats,
+                inputs=[],
+                outputs=[self.cache_stats_display]
+            )
+
+            self.preview_optimize_btn.click(
+                fn=self.preview_optimized_order,
+                inputs=[self.queue_state, self.optimize_pinned, self.optimize_group_order],
+                outputs=[self.optimize_summary]
+            )
+
+            self.apply_optimize_btn.click(
+                fn=self.apply_optimized_order,
+                inputs=[self.queue_state, self.optimize_pinned, self.optimize_group_order],
+                outputs=[self.queue_state, self.queue_display, self.optimize_summary]
+            )
+
+            self.refresh_cost_model_btn.click(
+                fn=lambda: self.cost_model.describe(),
+                inputs=[],
+                outputs=[self.cost_model_display]
+            )
+
+            self.reset_cost_model_btn.click(
+                fn=lambda: (self.cost_model.reset(), self.cost_model.describe())[1],
+                inputs=[],
+                outputs=[self.cost_model_display]
+            )
+
+            self.refresh_diagnostics_btn.click(
+                fn=self._render_diagnostics,
+                inputs=[],
+                outputs=[self.diagnostics_display]
+            )
+
+            self.export_diagnostics_btn.click(
+                fn=self.export_diagnostics,
+                inputs=[],
+                outputs=[self.diagnostics_file, self.diagnostics_display]
+            )
+
+            self.reset_diagnostics_btn.click(
+                fn=lambda: (self.stats.clear(), self._render_diagnostics())[1],
+                inputs=[],
+                outputs=[self.diagnostics_display]
+            )
+
             self.add_new_task_btn.click(
                 fn=lambda: (gr.Tabs(selected="video_gen"), True),
                 inputs=[],
@@ -666,6 +3108,57 @@ class QueueManagerPlugin(WAN2GPPlugin):
 
         return demo
 
+    def _render_cache_stats(self):
+        def fmt_bytes(n):
+            for unit in ("B", "KB", "MB"):
+                if n < 1024:
+                    return f"{n:.0f} {unit}"
+                n /= 1024
+            return f"{n:.1f} GB"
+
+        caches = [
+            ("Video frames (disk)", self.frame_cache),
+            ("Thumbnails (disk)", self.thumbnail_store),
+            ("Decoded images (memory)", self.image_cache),
+            ("Task images (disk)", self.blob_store),
+        ]
+        lines = ["| Cache | Entries | Size | Limit | Hits | Misses |", "|---|---|---|---|---|---|"]
+        for label, cache in caches:
+            if cache is None:
+                lines.append(f"| {label} | disabled | | | | |")
+                continue
+            st = cache.stats()
+            lines.append(f"| {label} | {st['entries']} | {fmt_bytes(st['bytes'])} | {fmt_bytes(st['max_bytes']) if st['max_bytes'] else 'none'} | {st['hits']} | {st['misses']} |")
+        return "\n".join(lines)
+
+    def _render_diagnostics(self):
+        summary = self.stats.summary()
+        if not summary:
+            return "No timings recorded yet."
+        lines = [
+            "| Operation | Calls | p50 | p90 | p99 | Max | Total | Avg response |",
+            "|---|---|---|---|---|---|---|---|",
+        ]
+        for op, st in sorted(summary.items(), key=lambda item: item[1]["total_ms"], reverse=True):
+            response = f"{st['avg_bytes'] / 1024:.1f} KB" if st["avg_bytes"] else ""
+            lines.append(
+                f"| {op} | {st['count']} | {st['p50_ms']:.1f} ms | {st['p90_ms']:.1f} ms | {st['p99_ms']:.1f} ms "
+                f"| {st['max_ms']:.1f} ms | {st['total_ms'] / 1000:.2f} s | {response} |"
+            )
+        lines.append(f"\nLast {self.stats.capacity} calls per operation. `host:` rows are time spent in WAN2GP itself.")
+        return "\n".join(lines)
+
+    def export_diagnostics(self):
+        try:
+            f = tempfile.NamedTemporaryFile("w", delete=False, suffix=".json", prefix="queue_editor_timings_", encoding="utf-8")
+            with f:
+                f.write(self.stats.to_json())
+            return gr.update(value=f.name, visible=True), self._render_diagnostics()
+        except Exception as e:
+            gr.Warning(f"Could not export timings: {e}")
+            return gr.update(), gr.update()
+
+    @_instrumented("send_queue_to_generator")
     def send_queue_to_generator(self, local_queue, mode, main_state):
         if not local_queue:
             gr.Warning("Queue is empty.")
@@ -683,17 +3176,15 @@ class QueueManagerPlugin(WAN2GPPlugin):
                 gen_info[key] = []
         current_main_queue = gen_info.get("queue", [])
 
-        import copy
-        tasks_to_send = copy.deepcopy(local_queue)
-
-        for task in tasks_to_send:
-            if 'params' in task:
-                task['params']['state'] = main_state
+        if not self._check_resolvable(local_queue, "send the queue"):
+            return gr.Tabs(selected="plugin_queue_manager_tab"), gr.update(), main_state
+        tasks_to_send = [self._derive_task(self._materialize_task(task), {'state': main_state}) for task in local_queue]
 
         if mode == "Replace Queue":
             final_queue = tasks_to_send
             for i, task in enumerate(final_queue):
                 task['id'] = i + 1
+            main_state["qm_sent_task_ids"] = set()
         else:
             start_id = 1
             if current_main_queue:
@@ -704,62 +3195,71 @@ class QueueManagerPlugin(WAN2GPPlugin):
             
             final_queue = current_main_queue + tasks_to_send
 
+        # Only these tasks are timed for the cost model; the host's own tasks are left alone.
+        main_state.setdefault("qm_sent_task_ids", set()).update(task['id'] for task in tasks_to_send)
         gen_info["queue"] = final_queue
         gen_info["prompts_max"] = len(final_queue)
 
-        main_html = self.update_queue_data(final_queue)
+        main_html = self._update_live_queue(final_queue)
 
         gr.Info(f"Sent {len(tasks_to_send)} tasks to Video Generator ({mode}).")
 
         return gr.Tabs(selected="video_gen"), main_html, main_state
 
-    def _get_available_loras(self, model_type):
+    def _update_live_queue(self, queue):
+        with self.stats.span("host:update_queue_data"):
+            return self.update_queue_data(queue)
+
+    def _editor_queue(self, queue):
+        if isinstance(queue, EditorQueue):
+            return queue
+        return EditorQueue(queue or [])
+
+    def _lora_dir(self, model_type):
         if not self.get_lora_dir or not model_type:
+            return ""
+        if model_type not in self._lora_dirs:
+            self._lora_dirs[model_type] = self.get_lora_dir(model_type)
+        return self._lora_dirs[model_type]
+
+    def _queue_model_types(self, queue):
+        return {task.get('params', {}).get('model_type') for task in queue} - {None, ""}
+
+    def _queue_lora_dirs(self, queue):
+        dirs = set()
+        for model_type in self._queue_model_types(queue):
+            try:
+                lora_dir = self._lora_dir(model_type)
+            except Exception as e:
+                print(f"Error fetching LoRAs: {e}")
+                continue
+            if lora_dir:
+                dirs.add(lora_dir)
+        return sorted(dirs)
+
+    def _get_available_loras(self, queue):
+        if not self.get_lora_dir:
             return []
         
-        try:
-            lora_dir = self.get_lora_dir(model_type)
-            if not lora_dir or not os.path.exists(lora_dir):
-                return []
-            
-            files = []
-            for ext in ['*.safetensors', '*.sft']:
-                files.extend(glob.glob(os.path.join(lora_dir, ext)))
-            
-            choices = [os.path.basename(f) for f in files]
-            choices.sort()
-            return choices
-        except Exception as e:
-            print(f"Error fetching LoRAs: {e}")
-            return []
+        choices = set()
+        for lora_dir in self._queue_lora_dirs(queue):
+            try:
+                choices.update(self.lora_catalog.list(lora_dir, background=True))
+            except Exception as e:
+                print(f"Error fetching LoRAs: {e}")
+        return sorted(choices)
 
     def _get_used_loras(self, queue):
-        used = set()
-        for task in queue:
-            params = task.get('params', {})
-            loras = params.get('activated_loras', [])
-            if loras:
-                for lora in loras:
-                    used.add(os.path.basename(lora))
-        
-        sorted_used = sorted(list(used))
-        return sorted_used
+        return self._editor_queue(queue).lora_index.names()
 
     def open_bulk_replacer(self, queue):
         if not queue:
             gr.Warning("Queue is empty.")
             return gr.update(), gr.update(), gr.update(), [], gr.update(), gr.update(), gr.update()
 
-        model_type = None
-        for task in queue:
-            params = task.get('params', {})
-            if params.get('model_type'):
-                model_type = params.get('model_type')
-                break
-
         used_loras = self._get_used_loras(queue)
 
-        available_loras = self._get_available_loras(model_type)
+        available_loras = self._get_available_loras(queue)
         
         return (
             gr.update(visible=True),
@@ -795,6 +3295,7 @@ class QueueManagerPlugin(WAN2GPPlugin):
         
         return new_list, html_out, gr.update(value=None), gr.update(value=None)
 
+    @_instrumented("perform_bulk_replace")
     def perform_bulk_replace(self, queue, replacements):
         if not queue:
             return queue, gr.update(), gr.update(), gr.update(), gr.update()
@@ -803,111 +3304,421 @@ class QueueManagerPlugin(WAN2GPPlugin):
             gr.Info("No replacements specified.")
             return queue, gr.update(), gr.update(), gr.update(), gr.update()
 
-        updated_count = 0
-        
-        for task in queue:
-            params = task.get('params', {})
-            activated_loras = params.get('activated_loras', [])
-            
-            if not activated_loras:
-                continue
-                
+        queue = self._editor_queue(queue)
+
+        # The first pair listed for a LoRA wins, and replaced paths are not matched again.
+        replace_map = {}
+        for pair in replacements:
+            replace_map.setdefault(os.path.basename(pair['find']), os.path.basename(pair['replace']))
+
+        affected = {}
+        for find_base in replace_map:
+            for task, slots in queue.lora_index.users(find_base):
+                affected.setdefault(id(task), (task, []))[1].extend(slots)
+
+        journal_ops = []
+        for task, slots in affected.values():
+            params = task['params']
             model_type = params.get('model_type')
-            lora_dir = self.get_lora_dir(model_type) if model_type and self.get_lora_dir else ""
-            
-            new_activated_loras = []
-            modified = False
-            
-            for lora_path in activated_loras:
-                current_base = os.path.basename(lora_path)
-                replaced = False
-                
-                for pair in replacements:
-                    find_base = os.path.basename(pair['find'])
-                    replace_base = os.path.basename(pair['replace'])
-                    
-                    if current_base == find_base:
-                        if lora_dir:
-                            new_path = os.path.join(lora_dir, replace_base)
-                        else:
-                            dir_name = os.path.dirname(lora_path)
-                            new_path = os.path.join(dir_name, replace_base)
-                        
-                        new_activated_loras.append(new_path)
-                        replaced = True
-                        modified = True
-                        break
-                
-                if not replaced:
-                    new_activated_loras.append(lora_path)
+            lora_dir = self._lora_dir(model_type) if model_type else ""
             
-            if modified:
-                params['activated_loras'] = new_activated_loras
-                updated_count += 1
+            new_activated_loras = list(params['activated_loras'])
+            for slot in slots:
+                lora_path = new_activated_loras[slot]
+                replace_base = replace_map[os.path.basename(lora_path)]
+                if lora_dir:
+                    new_activated_loras[slot] = os.path.join(lora_dir, replace_base)
+                else:
+                    new_activated_loras[slot] = os.path.join(os.path.dirname(lora_path), replace_base)
+
+            journal_ops.append(("params", task.get('id'), queue.position(task.get('id')),
+                                {"activated_loras": (params['activated_loras'], new_activated_loras)}))
+            task['params'] = dict(params, activated_loras=new_activated_loras)
+            queue.refresh(task)
 
+        queue.journal.record("Bulk replace LoRAs", journal_ops)
+        updated_count = len(affected)
         if updated_count > 0:
             gr.Info(f"Applied replacements to {updated_count} task(s).")
         else:
             gr.Info("No matching LoRAs found in queue.")
 
-        html_update = self.generate_table_html(queue)
-        
-        return queue, html_update, gr.update(visible=False), gr.update(visible=True), gr.update(visible=True)
+        # Rows may have entered or left an active LoRA filter or query view, so the table is
+        # rendered again rather than left to the client.
+        table = self.generate_table_html(queue) if updated_count else gr.update()
+        return queue, table, gr.update(visible=False), gr.update(visible=True), gr.update(visible=True)
+
+    def _sync_task_columns(self, task):
+        # Columns come from params alone: an undo that removes a key must not keep the value it set.
+        params = task.get('params', {})
+        task['prompt'] = params.get('prompt', "")
+        task['steps'] = params.get('num_inference_steps', 0)
+        task['length'] = params.get('video_length', 0)
+        task['repeats'] = params.get('repeat_generation', 1)
+
+    def _refresh_task_previews(self, task):
+        # Previews are rebuilt from params the next time the row is rendered.
+        task.pop('_qm_preview_fp', None)
+        task['start_image_data_base64'] = task['end_image_data_base64'] = None
+
+    def _row_runs(self, rows):
+        runs = []
+        for i in rows:
+            if runs and runs[-1][1] == i:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+        return runs
+
+    def _parse_row_spec(self, spec, count):
+        spec = (spec or "").strip()
+        if not spec:
+            return range(count)
+        rows = set()
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            first, _, last = part.partition("-")
+            first = int(first)
+            last = int(last) if last else first
+            if first < 1 or last > count or first > last:
+                raise ValueError(f"row range '{part}' is outside 1-{count}")
+            rows.update(range(first - 1, last))
+        return sorted(rows)
+
+    def _parse_bulk_value(self, text):
+        try:
+            return ast.literal_eval(text.strip())
+        except (ValueError, SyntaxError):
+            return text
+
+    @_instrumented("perform_bulk_edit")
+    def perform_bulk_edit(self, queue, field, operation, value_text, filter_text, rows_text):
+        if not queue:
+            gr.Warning("Queue is empty.")
+            return queue, gr.update()
+        field = (field or "").strip()
+        if not field:
+            gr.Warning("Please choose a parameter to edit.")
+            return queue, gr.update()
+
+        queue = self._editor_queue(queue)
+        try:
+            predicate = ParamExpression(filter_text) if (filter_text or "").strip() else None
+            expression = ParamExpression(value_text or "") if operation == "Expression" else None
+            literal = None if expression else self._parse_bulk_value(value_text or "")
+            rows = self._parse_row_spec(rows_text, len(queue))
+        except (SyntaxError, ValueError) as e:
+            gr.Warning(f"Invalid bulk edit: {e}")
+            return queue, gr.update()
+
+        refresh_previews = field in self.preview_param_keys
+        changed = skipped = 0
+        journal_ops = []
+        for index in rows:
+            task = queue[index]
+            params = task.get('params', {})
+            current = params.get(field)
+            # String fields take the text as typed, so "True" or "None" stays a string there.
+            operand = (value_text or "") if isinstance(current, str) else literal
+            try:
+                if predicate and not predicate(params, value=current, index=index):
+                    continue
+                if operation == "Add":
+                    new_value = current + operand
+                elif operation == "Multiply":
+                    new_value = ParamExpression.multiply(current, operand)
+                    if isinstance(current, int) and isinstance(new_value, float):
+                        new_value = int(round(new_value))
+                elif expression:
+                    new_value = expression(params, value=current, index=index)
+                else:
+                    new_value = operand
+            except Exception:
+                skipped += 1
+                continue
+
+            if type(new_value) is type(current) and new_value == current:
+                continue
+            journal_ops.append(("params", task.get('id'), index, {field: (params.get(field, _MISSING), new_value)}))
+            task['params'] = dict(params, **{field: new_value})
+            self._sync_task_columns(task)
+            if refresh_previews:
+                self._refresh_task_previews(task)
+            queue.refresh(task)
+            changed += 1
+
+        queue.journal.record(f"Bulk edit {field}", journal_ops)
+        message = f"Updated {field} on {changed} task(s)."
+        if skipped:
+            message += f" Skipped {skipped} task(s) where the operation could not be applied."
+        gr.Info(message)
+
+        if not changed:
+            return queue, gr.update()
+        return queue, self.generate_table_html(queue)
+
+    def _reload_signature(self, task):
+        params = task.get('params', {})
+        loras = params.get('activated_loras') or []
+        if not isinstance(loras, list):
+            loras = []
+        return params.get('model_type'), tuple(sorted(os.path.basename(str(lora)) for lora in loras))
+
+    def _count_reloads(self, signatures):
+        """Reloads (any change of model or LoRA set, including the first load) and, of those, model loads."""
+        reloads = model_loads = 0
+        previous = None
+        for signature in signatures:
+            if previous is None or signature != previous:
+                reloads += 1
+                if previous is None or signature[0] != previous[0]:
+                    model_loads += 1
+            previous = signature
+        return reloads, model_loads
+
+    def _optimized_order(self, queue, pinned, group_order):
+        """Queue positions in an order that runs tasks sharing a model and LoRA set back to back."""
+        signatures = [self._reload_signature(task) for task in queue]
+        groups = OrderedDict()
+        for i, signature in enumerate(signatures):
+            if i not in pinned:
+                groups.setdefault(signature, deque()).append(i)
+
+        ranked = list(groups)
+        if group_order == "Cheapest groups first":
+            # Shortest work first: results arrive sooner on average. Groups of one model stay together.
+            costs = self._queue_eta(queue)[0]
+            group_cost = {signature: sum(costs[i] for i in indices) for signature, indices in groups.items()}
+            model_cost = {}
+            for signature, cost in group_cost.items():
+                model_cost[signature[0]] = model_cost.get(signature[0], 0.0) + cost
+            ranked.sort(key=lambda signature: (model_cost[signature[0]], group_cost[signature]))
+        rank = {signature: r for r, signature in enumerate(ranked)}
+
+        order = []
+        previous = None
+        for slot in range(len(queue)):
+            if slot in pinned:
+                order.append(slot)
+                previous = signatures[slot]
+                continue
+            if previous in groups:
+                signature = previous
+            else:
+                same_model = [s for s in groups if previous is not None and s[0] == previous[0]]
+                signature = min(same_model or groups, key=rank.get)
+            order.append(groups[signature].popleft())
+            if not groups[signature]:
+                del groups[signature]
+            previous = signature
+        return order, signatures
+
+    def _plan_optimized_order(self, queue, pinned_text, group_order):
+        queue = self._editor_queue(queue)
+        pinned = set(self._parse_row_spec(pinned_text, len(queue))) if (pinned_text or "").strip() else set()
+        order, signatures = self._optimized_order(queue, pinned, group_order)
+        costs = self._queue_eta(queue)[0]
+        mean_wait = lambda positions: sum(itertools.accumulate(costs[i] for i in positions)) / max(1, len(positions))
+
+        before = self._count_reloads(signatures)
+        after = self._count_reloads(signatures[i] for i in order)
+        lines = [
+            f"Model or LoRA reloads: **{before[0]} → {after[0]}** (model loads: {before[1]} → {after[1]})",
+            f"Average wait for a result: {_format_duration(mean_wait(range(len(queue))))} → {_format_duration(mean_wait(order))}",
+        ]
+        if order == list(range(len(order))):
+            lines.append("The queue is already in the best order found.")
+        elif after[0] < before[0]:
+            lines.append(f"Saves {before[0] - after[0]} reload(s).")
+        else:
+            lines.append("This order saves no reloads.")
+        return queue, order, "\n\n".join(lines)
+
+    def preview_optimized_order(self, queue, pinned_text, group_order):
+        if not queue:
+            return "Queue is empty."
+        try:
+            return self._plan_optimized_order(queue, pinned_text, group_order)[2]
+        except ValueError as e:
+            return f"Invalid pinned rows: {e}"
+
+    @_instrumented("apply_optimized_order")
+    def apply_optimized_order(self, queue, pinned_text, group_order):
+        if not queue:
+            gr.Warning("Queue is empty.")
+            return queue, gr.update(), gr.update()
+        try:
+            queue, order, summary = self._plan_optimized_order(queue, pinned_text, group_order)
+        except ValueError as e:
+            gr.Warning(f"Invalid pinned rows: {e}")
+            return queue, gr.update(), gr.update()
+        if order == list(range(len(queue))):
+            gr.Info("The queue is already in the best order found.")
+            return queue, gr.update(), summary
+        reordered = [queue[i] for i in order]
+        queue.journal.record("Optimize order", [("splice", 0, list(queue), reordered)])
+        queue[:] = reordered
+        gr.Info("Queue reordered to reduce model and LoRA reloads.")
+        return queue, self.generate_table_html(queue), summary
+
+    def _query_status(self, queue):
+        if queue.view is None:
+            return ""
+        return f"Showing **{len(queue.view)}** of **{len(queue)}** tasks."
+
+    @_instrumented("apply_queue_query")
+    def apply_queue_query(self, queue, text, model_type, lora, steps_min, steps_max, length_min, length_max, start_image, end_image, sort):
+        queue = self._editor_queue(queue)
+        presence = {"With": True, "Without": False}
+        sort_keys = []
+        for choice in sort or []:
+            label, _, arrow = choice.rpartition(" ")
+            if label in QueueQuery.sort_fields:
+                sort_keys.append((QueueQuery.sort_fields[label], arrow == "↓"))
+        query = QueueQuery(
+            text=text, model_type=model_type or None, lora=lora or None,
+            steps=(steps_min, steps_max), length=(length_min, length_max),
+            start_image=presence.get(start_image), end_image=presence.get(end_image), sort=sort_keys,
+        )
+        queue.set_query(query)
+        return queue, self.generate_table_html(queue), self._query_status(queue)
+
+    def reset_queue_query(self, queue):
+        queue = self._editor_queue(queue)
+        queue.set_query(None)
+        return (queue, self.generate_table_html(queue), "", "", None, None, None, None, None, None, "Any", "Any", [])
 
     def toggle_template_selection(self, queue):
         if not queue:
             gr.Warning("Queue is empty. Load a queue first.")
             return False, gr.update(), gr.update(), gr.update(visible=False), gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
         gr.Info("Click a task row in the table to select it as the template.")
-        html_update = self.generate_table_html(queue, selection_mode=True)
+        patch_update = self._table_patch(queue, {"op": "selection_mode", "enabled": True})
         help_text = "This feature allows you to bridge a sequence of images or videos by generating transitions between them.\n\n**Step 1:** Select a task below to use as a **template** for parameters (Prompt, LoRA, etc.).\n**Step 2:** Select the files you want to bridge."
-        return True, html_update, gr.update(visible=False), gr.update(visible=True), help_text, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+        return True, patch_update, gr.update(visible=False), gr.update(visible=True), help_text, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
 
     def cancel_batch_operation(self, queue):
-        html_update = self.generate_table_html(queue)
-        return False, html_update, gr.update(visible=True), gr.update(visible=False), gr.update(visible=True)
+        patch_update = self._table_patch(queue, {"op": "select", "index": -1, "selection_mode": False})
+        return False, patch_update, gr.update(visible=True), gr.update(visible=False), gr.update(visible=True)
 
     def _get_frame_from_file(self, file_path, position="start"):
-        if not os.path.exists(file_path):
+        return self._get_file_frames(file_path, (position,)).get(position)
+
+    def _file_cache_key(self, file_path):
+        st = os.stat(file_path)
+        return (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+
+    def _frame_cache_key(self, file_path, position):
+        try:
+            return self._file_cache_key(file_path) + (position,)
+        except OSError:
             return None
 
+    def _get_file_frames(self, file_path, positions=("start", "end")):
+        frames = {position: None for position in positions}
+        if not os.path.exists(file_path):
+            return frames
+
+        file_key = self._file_cache_key(file_path)
+        frame_cache = self.frame_cache if self.has_video_file_extension(file_path) else None
+        for position in positions:
+            key = file_key + (position,)
+            image = self.image_cache.get(key)
+            if image is None and frame_cache:
+                image = self.frame_cache.get(key)
+                if image is not None:
+                    image = self.image_cache.put(key, image)
+            frames[position] = image
+        missing = [position for position in positions if frames[position] is None]
+        if not missing:
+            return frames
+
+        with self.stats.span("frames:extract"):
+            extracted = self._extract_file_frames(file_path, missing)
+        for position, image in extracted.items():
+            if image is not None:
+                key = file_key + (position,)
+                if frame_cache:
+                    try:
+                        frame_cache.put(key, image)
+                    except Exception as e:
+                        print(f"[QueueManager] Warning: Could not cache frame of {file_path}: {e}")
+                image = self.image_cache.put(key, image)
+            frames[position] = image
+        return frames
+
+    def _extract_file_frames(self, file_path, positions):
+        frames = {position: None for position in positions}
+
         if self.has_image_file_extension(file_path):
             try:
-                return Image.open(file_path)
+                image = Image.open(file_path)
+                image.load()
+                for position in positions:
+                    frames[position] = image
             except Exception as e:
                 print(f"Error opening image {file_path}: {e}")
-                return None
+            return frames
 
         if self.has_video_file_extension(file_path):
             try:
                 with tempfile.TemporaryDirectory() as tmpdir:
                     extracted = self.extract_source_images(file_path, tmpdir)
                     if extracted:
-                        target_key = 'image_end' if position == 'end' else 'image_start'
-                        candidates = extracted.get(target_key, [])
-                        if not isinstance(candidates, list):
-                            candidates = [candidates]
-                        
-                        if candidates and candidates[0]:
-                            path = candidates[-1] if position == 'end' else candidates[0]
-                            if os.path.exists(path):
-                                return Image.open(path)
+                        for position in positions:
+                            target_key = 'image_end' if position == 'end' else 'image_start'
+                            candidates = extracted.get(target_key, [])
+                            if not isinstance(candidates, list):
+                                candidates = [candidates]
+                            
+                            if candidates and candidates[0]:
+                                path = candidates[-1] if position == 'end' else candidates[0]
+                                if os.path.exists(path):
+                                    image = Image.open(path)
+                                    image.load()
+                                    frames[position] = image
             except Exception as e:
                 print(f"Warning: Failed to extract embedded images from {file_path}: {e}")
 
-            try:
-                fps, _, _, frames_count = self.get_video_info(file_path)
-                frame_idx = frames_count - 1 if position == 'end' else 0
-                return self.get_video_frame(file_path, frame_idx, return_PIL=True)
-            except Exception as e:
-                print(f"Error extracting frame from {file_path}: {e}")
-                return None
+            missing = [position for position in positions if frames[position] is None]
+            if missing:
+                try:
+                    fps, _, _, frames_count = self.get_video_info(file_path)
+                    for position in missing:
+                        frame_idx = frames_count - 1 if position == 'end' else 0
+                        frames[position] = self.get_video_frame(file_path, frame_idx, return_PIL=True)
+                except Exception as e:
+                    print(f"Error extracting frame from {file_path}: {e}")
         
-        return None
+        return frames
 
     def alphanum_key(self, s):
         return [int(c) if c.isdigit() else c.lower() for c in re.split('([0-9]+)', s)]
 
+    def _thumbnail_url(self, pil_image, cache_key=None):
+        with self.stats.span("thumbnails:encode"):
+            if self.thumbnail_store:
+                try:
+                    return self.thumbnail_store.url_for_image(pil_image, cache_key)
+                except Exception as e:
+                    print(f"[QueueManager] Warning: Could not cache thumbnail: {e}")
+            convert_fn = getattr(self, 'pil_to_base64_uri', None) or self._pil_to_base64
+            return convert_fn(pil_image, format="jpeg", quality=70)
+
+    def _intern_task_thumbnails(self, task):
+        if not self.thumbnail_store:
+            return task
+        for key in ('start_image_data_base64', 'end_image_data_base64'):
+            uris = task.get(key)
+            if uris and isinstance(uris, list):
+                try:
+                    task[key] = [self.thumbnail_store.url_for_data_uri(uri) for uri in uris]
+                except Exception as e:
+                    print(f"[QueueManager] Warning: Could not cache thumbnail: {e}")
+        return task
+
     def _pil_to_base64(self, pil_image, format="jpeg", quality=70):
         with io.BytesIO() as buffer:
             pil_image.save(buffer, format=format, quality=quality)
@@ -915,14 +3726,41 @@ class QueueManagerPlugin(WAN2GPPlugin):
             encoded_string = base64.b64encode(img_bytes).decode("utf-8")
             return f"data:image/{format};base64,{encoded_string}"
 
-    def process_batch_files(self, files, template_idx, mode, current_queue):
+    def _extract_bridge_frames(self, file_paths, workers, progress=None):
+        # The first file only contributes its last frame and the last file only its first;
+        # every file in between is opened once for both.
+        jobs = OrderedDict()
+        for i in range(len(file_paths) - 1):
+            jobs.setdefault(file_paths[i], []).append("end")
+            jobs.setdefault(file_paths[i + 1], []).append("start")
+
+        frames = {}
+        workers = max(1, int(workers or 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self._get_file_frames, path, tuple(positions)): path for path, positions in jobs.items()}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    file_frames = future.result()
+                except Exception as e:
+                    print(f"Error extracting frames from {path}: {e}")
+                    file_frames = {}
+                for position in jobs[path]:
+                    frames[(path, position)] = file_frames.get(position)
+                if progress is not None:
+                    progress((done, len(jobs)), desc=f"Extracted frames of {os.path.basename(path)}")
+        return frames
+
+    @_instrumented("process_batch_files")
+    @_holding_blobs
+    def process_batch_files(self, files, template_idx, mode, current_queue, workers=1, progress=gr.Progress()):
         if not files or len(files) < 2:
             gr.Warning("Need at least 2 files to create bridge tasks.")
-            return current_queue, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
+            return current_queue, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), ""
 
         if not current_queue:
             gr.Warning("Queue is empty. Load a queue first to serve as a template.")
-            return current_queue, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
+            return current_queue, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), ""
 
         try:
             idx = int(template_idx)
@@ -932,34 +3770,35 @@ class QueueManagerPlugin(WAN2GPPlugin):
             template_task = current_queue[idx]
         except:
             gr.Warning("Please select a valid template task first.")
-            return current_queue, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
+            return current_queue, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), ""
+        if not self._check_resolvable([template_task], "use this task as a template"):
+            return current_queue, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), ""
+        template_task = self._materialize_task(template_task)
 
         file_paths = [f.name for f in files]
         file_paths.sort(key=lambda f: self.alphanum_key(os.path.basename(f)))
         
         new_tasks = []
         start_id = 1
-        if mode == "Append to Queue" and current_queue:
-            start_id = max([t.get('id', 0) for t in current_queue]) + 1
+        if mode == "Append to Queue":
+            start_id = self._editor_queue(current_queue).next_id()
+
+        frames = self._extract_bridge_frames(file_paths, workers, progress)
 
         for i in range(len(file_paths) - 1):
             file_a = file_paths[i]
             file_b = file_paths[i+1]
             
-            img_start = self._get_frame_from_file(file_a, "end")
-            img_end = self._get_frame_from_file(file_b, "start")
+            img_start = frames.get((file_a, "end"))
+            img_end = frames.get((file_b, "start"))
             
             if not img_start or not img_end:
                 print(f"Skipping pair {os.path.basename(file_a)} -> {os.path.basename(file_b)}: Could not extract frames.")
                 continue
 
-            new_task = copy.deepcopy(template_task)
-            new_task['id'] = start_id + i
+            new_task = self._derive_task(template_task, {'image_start': [img_start], 'image_end': [img_end]}, id=start_id + i)
             params = new_task['params']
 
-            params['image_start'] = [img_start]
-            params['image_end'] = [img_end]
-
             current_ipt = params.get('image_prompt_type', '') or ''
             if 'S' not in current_ipt: current_ipt += 'S'
             if 'E' not in current_ipt: current_ipt += 'E'
@@ -969,10 +3808,8 @@ class QueueManagerPlugin(WAN2GPPlugin):
             params['image_prompt_type'] = params['image_prompt_type'].replace('V', '').replace('L', '')
 
             try:
-                start_b64 = self._pil_to_base64(img_start, format="jpeg", quality=70)
-                end_b64 = self._pil_to_base64(img_end, format="jpeg", quality=70)
-                new_task['start_image_data_base64'] = [start_b64]
-                new_task['end_image_data_base64'] = [end_b64]
+                new_task['start_image_data_base64'] = [self._thumbnail_url(img_start, self._frame_cache_key(file_a, "end"))]
+                new_task['end_image_data_base64'] = [self._thumbnail_url(img_end, self._frame_cache_key(file_b, "start"))]
                 new_task['start_image_data'] = [img_start]
                 new_task['end_image_data'] = [img_end]
                 new_task['start_image_labels'] = [f"End of {os.path.basename(file_a)}"]
@@ -980,21 +3817,34 @@ class QueueManagerPlugin(WAN2GPPlugin):
             except Exception as e:
                 print(f"Error creating thumbnails: {e}")
 
-            new_tasks.append(new_task)
+            new_tasks.append(self._compact_task(new_task))
 
         if not new_tasks:
             gr.Warning("No valid tasks could be generated.")
-            return current_queue, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
+            return current_queue, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), ""
 
+        html_update = gr.update()
+        patch_update = ""
+        first_new = len(current_queue)
+        was_windowed = self._is_windowed(current_queue)
+        final_queue = self._editor_queue(current_queue)
         if mode == "Replace Queue":
-            final_queue = new_tasks
+            final_queue.journal.record("Replace queue with bridge tasks", [("splice", 0, list(final_queue), new_tasks)])
+            final_queue[:] = new_tasks
+        else:
+            final_queue.journal.record("Add bridge tasks", [("splice", first_new, [], new_tasks)])
+            final_queue.extend(new_tasks)
+
+        if mode == "Replace Queue" or self._is_windowed(final_queue) != was_windowed:
+            html_update = self.generate_table_html(final_queue)
         else:
-            final_queue = current_queue + new_tasks
+            rows_html = self._render_rows(final_queue, first_new, min(len(final_queue), first_new + self.table_window_rows))
+            patch_update = self._table_patch(final_queue, {"op": "insert", "index": first_new, "html": rows_html},
+                                             {"op": "select", "index": -1, "selection_mode": False})
 
-        html_update = self.generate_table_html(final_queue)
         gr.Info(f"Generated {len(new_tasks)} bridge tasks.")
 
-        return final_queue, html_update, gr.update(visible=True), gr.update(visible=False), gr.update(visible=True), False, gr.update(visible=True), gr.update(visible=True)
+        return final_queue, html_update, gr.update(visible=True), gr.update(visible=False), gr.update(visible=True), False, gr.update(visible=True), gr.update(visible=True), patch_update
 
     def _wire_qm_logic(self):
         if self.js_trigger_index:
@@ -1007,9 +3857,10 @@ class QueueManagerPlugin(WAN2GPPlugin):
                     self.queue_display, 
                     self.qm_editing_index, 
                     self.live_queue_html, 
-                    self.qm_mode
+                    self.qm_mode,
+                    self.table_patch
                 ]
-            )
+            ).then(**self._patch_listener())
 
         if self.js_trigger_add:
             self.js_trigger_add.change(
@@ -1021,9 +3872,10 @@ class QueueManagerPlugin(WAN2GPPlugin):
                     self.queue_display, 
                     self.qm_add_mode,
                     self.download_btn,
-                    self.send_group
+                    self.send_group,
+                    self.table_patch
                 ]
-            )
+            ).then(**self._patch_listener())
 
         if self.qm_cancel_btn:
             self.qm_cancel_btn.click(
@@ -1057,7 +3909,7 @@ class QueueManagerPlugin(WAN2GPPlugin):
                 inputs=[self.main_state],
                 outputs=[self.status_trigger]
             ).then(
-                fn=self.process_tasks,
+                fn=self._observed_process_tasks if inspect.isgeneratorfunction(self.process_tasks) else self.process_tasks,
                 inputs=[self.main_state],
                 outputs=[self.preview_trigger, self.output_trigger],
                 trigger_mode="once"
@@ -1075,39 +3927,393 @@ class QueueManagerPlugin(WAN2GPPlugin):
                 outputs=[]
             )
 
-    def cleanup_temp_task(self, state):
+    def _observed_process_tasks(self, state):
+        """Runs the host's process_tasks, timing the editor's tasks at the queue head for the cost model."""
+        gen = self.get_gen_info(state)
+        sent_ids = state.setdefault("qm_sent_task_ids", set())
+        current, started = None, None
+
+        def settle():
+            nonlocal current, started
+            live_queue = gen.get("queue") or []
+            head = live_queue[0] if live_queue else None
+            if head is current:
+                return
+            now = time.time()
+            if current is not None and not gen.get("abort") and not any(task is current for task in live_queue):
+                sent_ids.discard(current.get('id'))
+                try:
+                    self.cost_model.observe(current.get('params', {}), now - started)
+                except Exception as e:
+                    print(f"[QueueManager] Warning: Could not record task timing: {e}")
+            # Each task's clock starts when it becomes the head; tasks the host queued itself
+            # are not tracked.
+            if head is not None and head.get('id') in sent_ids:
+                current, started = head, now
+            else:
+                current, started = None, None
+
+        settle()
+        for update in self.process_tasks(state):
+            settle()
+            yield update
+        settle()
+
+    def _drop_temp_task(self, state):
+        """Removes the edit placeholder pushed to the live queue, remembered by id in the session state."""
         gen = self.get_gen_info(state)
-        live_queue = gen.get("queue", [])
-        clean_queue = [t for t in live_queue if t.get('id', 0) >= -999]
-        gen["queue"] = clean_queue
-        self.update_queue_data(clean_queue)
+        live_queue = gen.setdefault("queue", [])
+        temp_id = state.pop("qm_temp_task_id", None)
+        if temp_id is None:
+            return live_queue
+        # The placeholder is appended last and the host only appends after it, so this is
+        # almost always a pop from the end.
+        for i in range(len(live_queue) - 1, -1, -1):
+            if live_queue[i].get('id') == temp_id:
+                del live_queue[i]
+                break
+        return live_queue
+
+    def cleanup_temp_task(self, state):
+        live_queue = self._drop_temp_task(state)
         state["editing_task_id"] = None
 
-        live_queue_html = self.update_queue_data(gen["queue"])
+        live_queue_html = self._update_live_queue(live_queue)
         return -1, gr.Tabs(selected="plugin_queue_manager_tab"), live_queue_html, False
 
-    def load_queue_file(self, file_obj, state):
+    def _read_queue_file(self, filename, state):
+        """Tasks of one .json or queue.zip, compacted so no decoded image outlives the call."""
+        if filename.lower().endswith('.json'):
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if isinstance(data, dict): data = [data]
+                for i, task in enumerate(data):
+                    if 'id' not in task: task['id'] = i + 100000 
+                queue_data = data
+        else:
+            with self.stats.span("archive:index"):
+                queue_data = self._load_queue_archive(filename)
+            if queue_data is None:
+                with self.stats.span("host:_parse_queue_zip"):
+                    queue_data, error = self._parse_queue_zip(filename, state)
+                if error:
+                    return None, f"Error parsing zip: {error}"
+        for task in queue_data:
+            self._intern_task_thumbnails(task)
+            self._compact_task(task)
+        return queue_data, None
+
+    @_instrumented("load_queue_file")
+    @_holding_blobs
+    def load_queue_file(self, file_obj, state, previous_queue=None):
         if not file_obj:
-            return [], "Error loading file.", gr.update(visible=False), gr.update(visible=False)
+            return [], "Error loading file.", gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
         filename = file_obj.name
         try:
-            if filename.lower().endswith('.json'):
-                with open(filename, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict): data = [data]
-                    for i, task in enumerate(data):
-                        if 'id' not in task: task['id'] = i + 100000 
-                    queue_data = data
-            else:
-                queue_data, error = self._parse_queue_zip(filename, state)
-                if error:
-                    return [], f"Error parsing zip: {error}", gr.update(visible=False), gr.update(visible=False)
+            queue_data, error = self._read_queue_file(filename, state)
+            if error:
+                return [], error, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+            queue_data = EditorQueue(queue_data)
+            # Edits made to the queue being replaced can be replayed onto this one, e.g. after reloading the same zip.
+            if isinstance(previous_queue, EditorQueue):
+                queue_data.previous_steps = previous_queue.journal.steps() or None
+            if self.get_lora_dir:
+                self.lora_catalog.prefetch(self._queue_lora_dirs(queue_data))
             html_table = self.generate_table_html(queue_data)
-            return queue_data, html_table, gr.update(visible=True), gr.update(visible=True)
+            return queue_data, html_table, gr.update(visible=True), gr.update(visible=True), gr.update(visible=bool(queue_data.previous_steps))
         except Exception as e:
-            return [], f"Exception loading file: {str(e)}", gr.update(visible=False), gr.update(visible=False)
+            return [], f"Exception loading file: {str(e)}", gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+
+    def _task_params_key(self, task, exact=False):
+        """Hash of a task's params with archive media identified by content; ``exact`` hashes member bytes."""
+        source = task.get('_qm_source')
+        archive = self._get_archive(source) if source else None
+
+        def media(value):
+            if ImageBlobStore.is_ref(value):
+                return ("blob", value)
+            if archive is not None and isinstance(value, str) and value in archive.members:
+                return ("sha1", archive.content_digest(value)) if exact else archive.member_digest(value)
+            return _value_fingerprint(value)
+
+        media_keys = set(LazyQueueArchive.image_keys) | set(LazyQueueArchive.video_keys)
+        items = []
+        for key, value in task.get('params', {}).items():
+            if key == 'state':
+                continue
+            if key in media_keys:
+                value = tuple(media(v) for v in value) if isinstance(value, list) else media(value)
+            else:
+                value = _value_fingerprint(value)
+            items.append((str(key), value))
+        items.sort(key=lambda item: item[0])
+        return hashlib.blake2b(repr(items).encode(), digest_size=16).hexdigest()
+
+    @_instrumented("merge_queue_files")
+    @_holding_blobs
+    def merge_queue_files(self, files, policy, skip_duplicates, target, current_queue, state, progress=gr.Progress()):
+        if not files:
+            gr.Warning("Choose the queue files to merge.")
+            return current_queue, gr.update(), gr.update(), gr.update()
+
+        queue = self._editor_queue(current_queue)
+        replace = target == "Replace Current List"
+        kept = [] if replace else list(queue)
+        used_ids = {task.get('id') for task in kept}
+        running_max = 0 if replace else (queue.max_id or 0)
+        # Tasks by cheap params key; a key match is only a duplicate once the exact keys,
+        # which hash the archive members involved, agree too.
+        seen = {}
+        def is_duplicate(task):
+            candidates = seen.setdefault(self._task_params_key(task), [])
+            exact = None
+            if candidates:
+                exact = self._task_params_key(task, exact=True)
+                for i, other in enumerate(candidates):
+                    if isinstance(other, dict):
+                        candidates[i] = other = self._task_params_key(other, exact=True)
+                    if other == exact:
+                        return True
+            candidates.append(exact or task)
+            return False
+        if skip_duplicates:
+            for task in kept:
+                is_duplicate(task)
+
+        # Archives are read one at a time and only their (lazy, compacted) task dicts are kept,
+        # so the sources are never all decoded at once.
+        per_file = []
+        remapped = duplicates = 0
+        for n, file_obj in enumerate(files):
+            filename = getattr(file_obj, 'name', file_obj)
+            if progress is not None:
+                progress((n, len(files)), desc=f"Reading {os.path.basename(filename)}")
+            try:
+                tasks, error = self._read_queue_file(filename, state)
+            except Exception as e:
+                tasks, error = None, str(e)
+            if error:
+                gr.Warning(f"Skipped {os.path.basename(filename)}: {error}")
+                continue
+            accepted = []
+            for task in tasks:
+                if skip_duplicates and is_duplicate(task):
+                    duplicates += 1
+                    continue
+                task_id = task.get('id')
+                if task_id in used_ids or not isinstance(task_id, int):
+                    running_max += 1
+                    task['id'] = task_id = running_max
+                    remapped += 1
+                used_ids.add(task_id)
+                running_max = max(running_max, task_id)
+                accepted.append(task)
+            per_file.append(accepted)
+
+        if policy == "Interleave":
+            merged = [task for group in itertools.zip_longest(*per_file) for task in group if task is not None]
+        else:
+            merged = [task for tasks in per_file for task in tasks]
+        if not merged:
+            gr.Warning("No tasks to merge.")
+            return queue, gr.update(), gr.update(), gr.update()
+
+        label = f"Merge {len(per_file)} queue file(s)"
+        if replace:
+            queue.journal.record(label, [("splice", 0, list(queue), merged)])
+            queue[:] = merged
+        else:
+            queue.journal.record(label, [("splice", len(queue), [], merged)])
+            queue.extend(merged)
+        if self.get_lora_dir:
+            self.lora_catalog.prefetch(self._queue_lora_dirs(queue))
+
+        message = f"Merged {len(merged)} task(s) from {len(per_file)} file(s)."
+        if duplicates:
+            message += f" Skipped {duplicates} duplicate(s)."
+        if remapped:
+            message += f" Gave {remapped} task(s) new ids."
+        gr.Info(message)
+        return queue, self.generate_table_html(queue), gr.update(visible=True), gr.update(visible=True)
+
+    def clear_queue(self, queue):
+        queue = self._editor_queue(queue)
+        if queue:
+            queue.journal.record("Clear list", [("splice", 0, list(queue), [])])
+            queue.clear()
+        return queue, "<div style='padding:20px; text-align:center; color:grey;'>List cleared.</div>", gr.update(visible=False), gr.update(visible=False)
+
+    def replay_previous_edits(self, queue):
+        queue = self._editor_queue(queue)
+        steps, queue.previous_steps = queue.previous_steps, None
+        if not steps:
+            gr.Info("No previous edits to replay.")
+            return queue, gr.update(), gr.update(visible=False)
+        replayed = queue.journal.replay(steps, queue, self._journal_params_changed)
+        gr.Info(f"Replayed {replayed} of {len(steps)} edit(s) onto the loaded queue.")
+        return queue, self.generate_table_html(queue), gr.update(visible=False)
+
+    def _journal_params_changed(self, task, keys):
+        self._sync_task_columns(task)
+        if keys & set(self.preview_param_keys):
+            self._refresh_task_previews(task)
+
+    def _task_thumbnail(self, task, side):
+        if task.get(f'{side}_image_data_base64') is None:
+            self._ensure_lazy_previews(task)
+        uris = task.get(f'{side}_image_data_base64')
+        uri = uris[0] if uris and isinstance(uris, list) and len(uris) > 0 else None
+        if uri and self.thumbnail_store and not self.thumbnail_store.contains(uri):
+            images = task.get(f'{side}_image_data')
+            if images:
+                uri = self._thumbnail_url(images[0])
+                task[f'{side}_image_data_base64'] = [uri] + list(uris[1:])
+            else:
+                task['start_image_data_base64'] = task['end_image_data_base64'] = None
+                return self._task_thumbnail(task, side)
+        return uri
+
+    def _task_row_fields(self, task):
+        params = task.get('params', {})
+        full_prompt = str(task.get('prompt', params.get('prompt', '')))
+        start_img_uri = self._task_thumbnail(task, 'start')
+        end_img_uri = self._task_thumbnail(task, 'end')
+        steps = task.get('steps', params.get('num_inference_steps', '?'))
+        length = task.get('length', params.get('video_length', '?'))
+        repeats = task.get('repeats', params.get('repeat_generation', 1))
+        return repeats, full_prompt, length, steps, start_img_uri, end_img_uri
+
+    def _render_row_cells(self, task):
+        # The cells depend on nothing but the fields, so those are the key; sessions render
+        # concurrently and share the cache, hence the lock.
+        fields = self._task_row_fields(task)
+        with self._row_cache_lock:
+            cached = self._row_cache.get(fields)
+            if cached is not None:
+                self._row_cache.move_to_end(fields)
+                return cached
+
+        repeats, full_prompt, length, steps, start_img_uri, end_img_uri = fields
+        truncated_prompt = (html.escape(full_prompt[:97]) + '...') if len(full_prompt) > 100 else html.escape(full_prompt)
+        start_img_div = f'<div class="hover-image"><img src="{start_img_uri}" alt="start"></div>' if start_img_uri else ""
+        end_img_div = f'<div class="hover-image"><img src="{end_img_uri}" alt="end"></div>' if end_img_uri else ""
+
+        edit_btn = """
+            <button onclick="event.stopPropagation(); qmHandleAction('edit', qmRowIndex(this))" class="action-button" title="Edit">
+                <img src="/gradio_api/file=icons/edit.svg" style="width: 20px; height: 20px;" onerror="this.style.display='none';this.nextSibling.style.display='inline'">
+                <span style="display:none; font-size:1.2em;">✏️</span>
+            </button>"""
+        remove_btn = """
+            <button onclick="event.stopPropagation(); qmHandleAction('remove', qmRowIndex(this))" class="action-button" title="Remove">
+                <img src="/gradio_api/file=icons/remove.svg" style="width: 20px; height: 20px;" onerror="this.style.display='none';this.nextSibling.style.display='inline'">
+                <span style="display:none; font-size:1.2em;">🗑️</span>
+            </button>"""
 
-    def generate_table_html(self, queue, selected_index=-1, selection_mode=False):
+        cells = f"""
+                <td class="center-align">{repeats}</td>
+                <td><div class="prompt-cell" title="{html.escape(full_prompt)}">{truncated_prompt}</div></td>
+                <td class="center-align">{length}</td>
+                <td class="center-align">{steps}</td>
+                <td class="center-align">{start_img_div}</td>
+                <td class="center-align">{end_img_div}</td>""", f"""
+                <td class="center-align">{edit_btn}</td>
+                <td class="center-align">{remove_btn}</td>"""
+
+        with self._row_cache_lock:
+            self._row_cache[fields] = cells
+            if len(self._row_cache) > self._row_cache_size:
+                self._row_cache.popitem(last=False)
+        return cells
+
+    def _queue_eta(self, queue):
+        if isinstance(queue, EditorQueue):
+            return queue.costs(self.cost_model.estimate, self.cost_model.version)
+        per_task = [self.cost_model.estimate(task.get('params', {})) for task in queue]
+        return per_task, list(itertools.accumulate(per_task))
+
+    def _render_row(self, task, index, selected=False, eta=(0.0, 0.0)):
+        row_class = "draggable-row alternating-grey-row"
+        if selected:
+            row_class += " selected-row"
+        cells, actions = self._render_row_cells(task)
+        seconds, cumulative = eta
+
+        # The estimate columns sit outside the cached cells: the running total changes whenever an earlier row does.
+        return f"""
+            <tr draggable="true" class="{row_class}" data-index="{index}" data-eta="{seconds:.1f}" data-cum="{cumulative:.1f}"
+                ondragstart="qmDragStart(event)" ondragover="qmDragOver(event)" ondrop="qmDrop(event)"
+                ondragenter="qmDragEnter(event)" ondragleave="qmDragLeave(event)" ondragend="qmDragEnd(event)"
+                onclick="qmRowClick(event, this)"
+                title="Drag to reorder / Click, Ctrl+Click or Shift+Click to select">
+                <td class="center-align"><input type="checkbox" class="qm-row-check" onclick="event.stopPropagation(); qmSelectRow(qmRowIndex(this), event)"></td>{cells}
+                <td class="center-align">{_format_duration(seconds)}</td>
+                <td class="center-align qm-cum">{_format_duration(cumulative)}</td>{actions}
+            </tr>"""
+
+    def _display_rows(self, queue):
+        # Queue positions in table order: the active query's view, or the whole queue.
+        if isinstance(queue, EditorQueue):
+            return queue.display_positions()
+        return range(len(queue))
+
+    def _is_windowed(self, queue):
+        return len(self._display_rows(queue)) > self.table_window_threshold
+
+    def _clamp_window_start(self, queue, start):
+        try:
+            start = int(start or 0)
+        except (TypeError, ValueError):
+            start = 0
+        return max(0, min(start, len(self._display_rows(queue)) - self.table_window_rows))
+
+    def _render_rows(self, queue, start, stop, selected_index=-1):
+        costs, cumulative = self._queue_eta(queue)
+        return "".join(self._render_row(queue[i], i, i == selected_index, (costs[i], cumulative[i]))
+                       for i in self._display_rows(queue)[start:stop])
+
+    def _window_patch(self, queue, start):
+        start = self._clamp_window_start(queue, start)
+        stop = min(len(self._display_rows(queue)), start + self.table_window_rows)
+        return {"op": "window", "start": start, "html": self._render_rows(queue, start, stop)}
+
+    def _window_splice_ops(self, queue, view_start, removed=None, inserted=None):
+        """Ops for one row removed and/or inserted, topping the client's window up with at most one edge row."""
+        # Mirrors the bookkeeping qmApplyPatch does for remove and insert ops.
+        total = len(queue) + (removed is not None) - (inserted is not None)
+        try:
+            start = max(0, min(int(view_start or 0), total))
+        except (TypeError, ValueError):
+            start = 0
+        stop = min(total, start + self.table_window_rows)
+        ops = []
+        if removed is not None:
+            ops.append({"op": "remove", "index": removed})
+            total -= 1
+            if removed < start:
+                start, stop = start - 1, stop - 1
+            elif removed < stop:
+                stop -= 1
+        if inserted is not None:
+            # The row is sent even when it lands outside the window: the client counts it to shift its offset.
+            ops.append({"op": "insert", "index": inserted, "html": self._render_rows(queue, inserted, inserted + 1)})
+            if inserted < start:
+                start, stop = start + 1, stop + 1
+            elif inserted < stop or inserted == stop == total:
+                stop += 1
+            total += 1
+        stop = min(stop, start + self.table_window_rows)
+        if stop - start < self.table_window_rows:
+            if stop < total:
+                ops.append({"op": "fill", "index": stop, "html": self._render_rows(queue, stop, stop + 1)})
+            elif start > 0:
+                start -= 1
+                ops.append({"op": "fill", "index": start, "html": self._render_rows(queue, start, start + 1)})
+        # Rows before the window may have changed, so the client's running totals restart from here.
+        ops.append({"op": "eta_base", "cum": self._queue_eta(queue)[1][start - 1] if start > 0 else 0.0})
+        return ops
+
+    @_instrumented("html:generate_table_html")
+    def generate_table_html(self, queue, selected_index=-1, selection_mode=False, window_start=0):
         if not queue:
             return "<div style='padding:20px; text-align:center; color:grey;'>Queue is empty.</div>"
         
@@ -1115,71 +4321,93 @@ class QueueManagerPlugin(WAN2GPPlugin):
         if selection_mode:
             wrapper_class += " selection-active"
 
-        html_str = f'<div class="{wrapper_class}">'
-        html_str += """
+        total = len(self._display_rows(queue))
+        filtered = getattr(queue, 'view', None) is not None
+        windowed = self._is_windowed(queue)
+        start, stop = 0, total
+        if windowed:
+            wrapper_class += " qm-windowed"
+            start = self._clamp_window_start(queue, window_start)
+            stop = min(total, start + self.table_window_rows)
+
+        parts = [f'<div class="{wrapper_class}" data-rev="{next(self._render_rev)}">']
+        parts.append(
+            f'<div class="qm-eta-summary">Estimated total: <b class="qm-eta-total">{self._eta_summary(queue)}</b> '
+            f'<span title="{html.escape(self.cost_model.describe())}">ⓘ</span></div>'
+        )
+        parts.append("""
+        <div class="qm-batch-bar">
+            <span><b class="qm-batch-count">0</b> selected</span>
+            <button onclick="qmBatchAction('remove_many')">Delete</button>
+            <button onclick="qmBatchAction('duplicate')">Duplicate</button>
+            <button onclick="qmBatchAction('move_block', {to: 0})">Move to Top</button>
+            <button onclick="qmBatchAction('move_block', {to: 1e9})">Move to Bottom</button>
+            <button onclick="qmBatchAction('move_block')">Move to Row...</button>
+            <button onclick="qmBatchAction('set_repeats')">Set Repeats...</button>
+            <button onclick="qmSelectAll(false)">Clear Selection</button>
+        </div>""")
+        if windowed:
+            parts.append('<div class="qm-scroll" onscroll="qmOnTableScroll(this)">')
+        parts.append("""
         <table class="qm-table">
             <thead>
                 <tr>
+                    <th style="width:3%;" class="center-align"><input type="checkbox" class="qm-check-all" title="Select all" onclick="qmSelectAll(this.checked)"></th>
                     <th style="width:5%;" class="center-align">Qty</th>
                     <th style="width:auto;" class="text-left">Prompt</th>
                     <th style="width:7%;" class="center-align">Length</th>
                     <th style="width:7%;" class="center-align">Steps</th>
                     <th style="width:10%;" class="center-align">Start/Ref</th>
                     <th style="width:10%;" class="center-align">End</th>
+                    <th style="width:6%;" class="center-align" title="Estimated generation time">ETA</th>
+                    <th style="width:7%;" class="center-align" title="Estimated time from the start of the queue until this task is done">Done After</th>
                     <th style="width:4%;" class="center-align" title="Edit"></th>
                     <th style="width:4%;" class="center-align" title="Remove"></th>
                 </tr>
             </thead>
-            <tbody>
-        """
-        for i, task in enumerate(queue):
-            params = task.get('params', {})
-            full_prompt = str(task.get('prompt', params.get('prompt', '')))
-            truncated_prompt = (html.escape(full_prompt[:97]) + '...') if len(full_prompt) > 100 else html.escape(full_prompt)
-            start_data = task.get('start_image_data_base64')
-            start_img_uri = start_data[0] if start_data and isinstance(start_data, list) and len(start_data) > 0 else None
-            end_data = task.get('end_image_data_base64')
-            end_img_uri = end_data[0] if end_data and isinstance(end_data, list) and len(end_data) > 0 else None
-            start_img_div = f'<div class="hover-image"><img src="{start_img_uri}" alt="start"></div>' if start_img_uri else ""
-            end_img_div = f'<div class="hover-image"><img src="{end_img_uri}" alt="end"></div>' if end_img_uri else ""
-            steps = task.get('steps', params.get('num_inference_steps', '?'))
-            length = task.get('length', params.get('video_length', '?'))
-            
-            edit_btn = f"""
-            <button onclick="event.stopPropagation(); qmHandleAction('edit', {i})" class="action-button" title="Edit">
-                <img src="/gradio_api/file=icons/edit.svg" style="width: 20px; height: 20px;" onerror="this.style.display='none';this.nextSibling.style.display='inline'">
-                <span style="display:none; font-size:1.2em;">✏️</span>
-            </button>"""
-            remove_btn = f"""
-            <button onclick="event.stopPropagation(); qmHandleAction('remove', {i})" class="action-button" title="Remove">
-                <img src="/gradio_api/file=icons/remove.svg" style="width: 20px; height: 20px;" onerror="this.style.display='none';this.nextSibling.style.display='inline'">
-                <span style="display:none; font-size:1.2em;">🗑️</span>
-            </button>"""
-
-            row_class = "draggable-row alternating-grey-row"
-            if i == selected_index:
-                row_class += " selected-row"
-
-            row_html = f"""
-            <tr draggable="true" class="{row_class}" data-index="{i}" 
-                ondragstart="qmDragStart(event)" ondragover="qmDragOver(event)" ondrop="qmDrop(event)"
-                ondragenter="qmDragEnter(event)" ondragleave="qmDragLeave(event)" ondragend="qmDragEnd(event)"
-                onclick="qmRowClick(event, {i})"
-                title="Drag to reorder / Click to select (if in selection mode)">
-                <td class="center-align">{task.get('repeats', params.get('repeat_generation', 1))}</td>
-                <td><div class="prompt-cell" title="{html.escape(full_prompt)}">{truncated_prompt}</div></td>
-                <td class="center-align">{length}</td>
-                <td class="center-align">{steps}</td>
-                <td class="center-align">{start_img_div}</td>
-                <td class="center-align">{end_img_div}</td>
-                <td class="center-align">{edit_btn}</td>
-                <td class="center-align">{remove_btn}</td>
-            </tr>"""
-            html_str += row_html
-        html_str += "</tbody></table></div>"
-        return html_str
-
+        """)
+        if windowed:
+            parts.append(
+                f'<tbody class="qm-pad-top"><tr><td colspan="11" style="height:{start * self.table_row_height}px; padding:0; border:none;"></td></tr></tbody>'
+            )
+        parts.append(
+            f'<tbody class="qm-rows" data-offset="{start}" data-total="{total}" data-selected="{selected_index}" data-windowed="{1 if windowed else 0}" data-view="{1 if filtered else 0}" '
+            f'data-window-rows="{self.table_window_rows}" data-overscan="{self.table_window_overscan}" data-row-height="{self.table_row_height}">'
+        )
+        parts.append(self._render_rows(queue, start, stop, selected_index))
+        parts.append("</tbody>")
+        if windowed:
+            parts.append(
+                f'<tbody class="qm-pad-bottom"><tr><td colspan="11" style="height:{(total - stop) * self.table_row_height}px; padding:0; border:none;"></td></tr></tbody>'
+            )
+        parts.append("</table></div>")
+        if windowed:
+            parts.append("</div>")
+        return "".join(parts)
+
+    def _patch_listener(self):
+        return dict(fn=None, js="(patch) => { if (window.qmApplyPatch) window.qmApplyPatch(patch); }", inputs=[self.table_patch])
+
+    def _table_patch(self, queue, *ops):
+        view = getattr(queue, 'view', None)
+        if view is not None and any(op.get("op") in ("remove", "move", "insert", "replace") for op in ops):
+            # Filtered rows are not contiguous and an edit can move a row in or out of the view
+            # or shift the running time estimates of rows after it, so those changes re-render
+            # the current window instead.
+            ops = [{"op": "refresh"}]
+        return json.dumps({"seq": next(self._patch_seq), "total": len(self._display_rows(queue)), "eta": self._eta_summary(queue), "ops": list(ops)})
+
+    def _row_patch(self, op, queue, index):
+        costs, cumulative = self._queue_eta(queue)
+        return {"op": op, "index": index, "html": self._render_row(queue[index], index, eta=(costs[index], cumulative[index]))}
+
+    def _eta_summary(self, queue):
+        cumulative = self._queue_eta(queue)[1]
+        return _format_duration(cumulative[-1] if cumulative else 0)
+
+    @_instrumented("handle_js_action", _js_action_name)
     def handle_js_action(self, action_json, queue, state, selection_mode):
+        queue = self._editor_queue(queue)
         updated_queue = queue
         html_update = gr.update()
         main_queue_input_update = ""
@@ -1191,15 +4419,17 @@ class QueueManagerPlugin(WAN2GPPlugin):
         batch_files_update = gr.update()
         batch_options_update = gr.update()
         batch_btn_update = gr.update()
+        patch_update = ""
 
         try:
             data = json.loads(action_json)
             action = data['action']
             param = data['param']
+            view_start = data.get('view', 0)
         except:
             return (updated_queue, html_update, main_queue_input_update, index_update, qm_mode_update, 
                     selected_template_idx_update, selection_mode_update, batch_info_update, batch_files_update, 
-                    batch_options_update, batch_btn_update, gr.update(), gr.update())
+                    batch_options_update, batch_btn_update, gr.update(), gr.update(), patch_update)
 
         if action == "select":
             index = int(param)
@@ -1210,38 +4440,65 @@ class QueueManagerPlugin(WAN2GPPlugin):
                 batch_files_update = gr.update(visible=True)
                 batch_options_update = gr.update(visible=True)
                 batch_btn_update = gr.update(visible=True)
-                html_update = self.generate_table_html(queue, index, selection_mode=False)
+                patch_update = self._table_patch(queue, {"op": "select", "index": index, "selection_mode": False})
             else:
                 pass
 
+        elif action == "refresh":
+            html_update = self.generate_table_html(queue, selection_mode=bool(selection_mode), window_start=view_start)
+
+        elif action == "window":
+            if queue:
+                patch_update = self._table_patch(queue, self._window_patch(queue, param))
+
         elif action == "remove":
             index = int(param)
             if 0 <= index < len(queue):
+                was_windowed = self._is_windowed(queue)
+                queue.journal.record("Remove task", [("splice", index, [queue[index]], [])])
                 queue.pop(index)
                 updated_queue = queue
-                html_update = self.generate_table_html(updated_queue)
+                if not updated_queue or was_windowed != self._is_windowed(updated_queue):
+                    html_update = self.generate_table_html(updated_queue, window_start=view_start)
+                elif was_windowed:
+                    patch_update = self._table_patch(queue, *self._window_splice_ops(queue, view_start, removed=index))
+                else:
+                    patch_update = self._table_patch(queue, {"op": "remove", "index": index})
         
         elif action == "move":
             from_idx, to_idx = int(param[0]), int(param[1])
             if 0 <= from_idx < len(queue) and 0 <= to_idx < len(queue) and from_idx != to_idx:
                 item = queue.pop(from_idx)
                 queue.insert(to_idx, item)
+                queue.journal.record("Move task", [("splice", from_idx, [item], []), ("splice", to_idx, [], [item])])
                 updated_queue = queue
-                html_update = self.generate_table_html(updated_queue)
+                if self._is_windowed(queue):
+                    patch_update = self._table_patch(queue, *self._window_splice_ops(queue, view_start, removed=from_idx, inserted=to_idx))
+                else:
+                    patch_update = self._table_patch(queue, {"op": "move", "from": from_idx, "to": to_idx})
                 
+        elif action in ("remove_many", "move_block", "duplicate", "set_repeats"):
+            html_update, patch_update = self._apply_batch_action(queue, action, param, view_start)
+
+        elif action in ("undo", "redo"):
+            step = getattr(queue.journal, action)
+            label = step(queue, self._journal_params_changed)
+            if label is None:
+                gr.Info(f"Nothing to {action}.")
+            else:
+                gr.Info(f"{'Undid' if action == 'undo' else 'Redid'}: {label}")
+                html_update = self.generate_table_html(queue, selection_mode=bool(selection_mode), window_start=view_start)
+
         elif action == "edit":
             index = int(param)
-            if 0 <= index < len(queue):
+            if 0 <= index < len(queue) and self._check_resolvable([queue[index]], "edit this task"):
                 task = queue[index]
-                gen = self.get_gen_info(state)
-                live_queue = gen.get("queue", [])
-                gen["queue"] = [t for t in live_queue if t.get('id', 0) >= -999]
-                live_queue = gen["queue"] 
+                live_queue = self._drop_temp_task(state)
                 temp_id = -1000 - index
-                temp_task = copy.deepcopy(task)
-                temp_task['id'] = temp_id
+                temp_task = self._derive_task(self._materialize_task(task), id=temp_id)
                 live_queue.append(temp_task)
-                self.update_queue_data(live_queue)
+                state["qm_temp_task_id"] = temp_id
+                self._update_live_queue(live_queue)
 
                 index_update = index
                 main_queue_input_update = f"edit_{temp_id}"
@@ -1252,23 +4509,192 @@ class QueueManagerPlugin(WAN2GPPlugin):
 
         return (updated_queue, html_update, main_queue_input_update, index_update, qm_mode_update, 
                 selected_template_idx_update, selection_mode_update, batch_info_update, batch_files_update, 
-                batch_options_update, batch_btn_update, buttons_vis, buttons_vis)
+                batch_options_update, batch_btn_update, buttons_vis, buttons_vis, patch_update)
 
-    def save_current_queue(self, queue):
+    def _apply_batch_action(self, queue, action, param, view_start=0):
+        try:
+            rows = sorted(self._display_rows(queue)) if param.get('all') else sorted({int(i) for i in param.get('rows', [])})
+        except (AttributeError, TypeError, ValueError):
+            return gr.update(), ""
+        rows = [i for i in rows if 0 <= i < len(queue)]
+        if not rows:
+            return gr.update(), ""
+        chosen = set(rows)
+
+        if action == "set_repeats":
+            try:
+                repeats = max(1, int(param.get('value', 1)))
+            except (TypeError, ValueError):
+                return gr.update(), ""
+            ops = []
+            for i in rows:
+                task = queue[i]
+                old_params = task.get('params', {})
+                task['params'] = dict(old_params, repeat_generation=repeats)
+                ops.append(QueueJournal.params_op(task, i, old_params, task['params'], ("repeat_generation",)))
+                self._sync_task_columns(task)
+                queue.refresh(task)
+            queue.journal.record(f"Set repeats on {len(rows)} task(s)", ops)
+            if self._is_windowed(queue):
+                return gr.update(), self._table_patch(queue, self._window_patch(queue, view_start))
+            return gr.update(), self._table_patch(queue, *(self._row_patch("replace", queue, i) for i in rows))
+
+        # Structural changes rebuild the list once and re-render once, however many rows are involved.
+        # The journal gets one operation per run of adjacent rows, taken out from the bottom up.
+        removals = [("splice", start, queue[start:stop], []) for start, stop in reversed(self._row_runs(rows))]
+        if action == "remove_many":
+            queue[:] = [t for i, t in enumerate(queue) if i not in chosen]
+            queue.journal.record(f"Remove {len(rows)} task(s)", removals)
+            gr.Info(f"Removed {len(rows)} task(s).")
+        elif action == "move_block":
+            try:
+                to = max(0, min(int(param.get('to', 0)), len(queue)))
+            except (TypeError, ValueError):
+                return gr.update(), ""
+            block = [queue[i] for i in rows]
+            before = [t for i, t in enumerate(queue) if i < to and i not in chosen]
+            after = [t for i, t in enumerate(queue) if i >= to and i not in chosen]
+            reordered = before + block + after
+            if all(a is b for a, b in zip(reordered, queue)):
+                # The block is already there, so there is nothing to apply or to undo.
+                return gr.update(), ""
+            queue[:] = reordered
+            queue.journal.record(f"Move {len(rows)} task(s)", removals + [("splice", len(before), [], block)])
+        elif action == "duplicate":
+            next_id = queue.next_id()
+            tasks = []
+            ops = []
+            for i, task in enumerate(queue):
+                tasks.append(task)
+                if i in chosen:
+                    duplicate = self._derive_task(task, id=next_id)
+                    ops.append(("splice", len(tasks), [], [duplicate]))
+                    tasks.append(duplicate)
+                    next_id += 1
+            queue[:] = tasks
+            queue.journal.record(f"Duplicate {len(rows)} task(s)", ops)
+            gr.Info(f"Duplicated {len(rows)} task(s).")
+        return self.generate_table_html(queue, window_start=view_start), ""
+
+    def _cleanup_stale_exports(self):
+        active = {job.path for job in self._export_jobs.values()}
+        cutoff = time.time() - self.export_retention_hours * 3600
+        for pattern in ("modified_queue_*.zip", "queue_shards_*"):
+            exports = []
+            for path in glob.glob(os.path.join(tempfile.gettempdir(), pattern)):
+                try:
+                    exports.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+            exports.sort(reverse=True)
+            for rank, (mtime, path) in enumerate(exports):
+                if path in active:
+                    continue
+                if rank >= self.export_retention_count or mtime < cutoff:
+                    try:
+                        if os.path.isdir(path):
+                            shutil.rmtree(path)
+                        else:
+                            os.remove(path)
+                    except OSError:
+                        pass
+
+    def _balance_shards(self, queue, count):
+        """Splits the queue into count shards of near-equal estimated cost, each keeping queue order."""
+        costs = self._queue_eta(queue)[0]
+        heap = [(0.0, k) for k in range(count)]
+        members = [[] for _ in range(count)]
+        for index in sorted(range(len(queue)), key=lambda i: -costs[i]):
+            load, k = heapq.heappop(heap)
+            members[k].append(index)
+            heapq.heappush(heap, (load + costs[index], k))
+        shards = []
+        for indices in members:
+            indices.sort()
+            shards.append(([queue[i] for i in indices], sum(costs[i] for i in indices)))
+        return [shard for shard in shards if shard[0]]
+
+    @_instrumented("export_shards")
+    def export_shards(self, queue, count, running_job_id=None):
+        if not queue:
+            gr.Warning("Queue is empty, nothing to export.")
+            return running_job_id, gr.update(), gr.update(), gr.update()
+        if running_job_id in self._export_jobs:
+            gr.Info("A shard export is already running.")
+            return running_job_id, gr.update(), gr.update(), gr.update()
+        if not self._check_resolvable(queue, "export the queue"):
+            return running_job_id, gr.update(), gr.update(), gr.update()
+        try:
+            self._cleanup_stale_exports()
+            shards = self._balance_shards(queue, max(1, min(int(count or 1), len(queue))))
+            job = QueueShardExport(shards, tempfile.mkdtemp(prefix="queue_shards_"), self._get_archive)
+            job_id = os.path.basename(job.path)
+            self._export_jobs[job_id] = job.start()
+            return (job_id, gr.update(value=f"Exporting {len(shards)} shards, 0/{job.total} tasks...", visible=True),
+                    gr.Timer(active=True), gr.update(value=None, visible=False))
+        except Exception as e:
+            print(f"Error exporting shards: {e}")
+            gr.Warning(f"Error exporting shards: {e}")
+            return None, gr.update(visible=False), gr.Timer(active=False), gr.update()
+
+    def poll_shard_export(self, job_id):
+        job = self._export_jobs.get(job_id)
+        if job is None:
+            return gr.update(), gr.update(), gr.Timer(active=False), None
+        if not job.finished:
+            return gr.update(), gr.update(value=f"Exporting {len(job.jobs)} shards, {job.done}/{job.total} tasks...", visible=True), gr.update(), job_id
+
+        del self._export_jobs[job_id]
+        if job.error:
+            gr.Warning(f"Error exporting shards: {job.error}")
+            return gr.update(), gr.update(visible=False), gr.Timer(active=False), None
+        self.stats.record("export:write_shards", job.elapsed, sum(os.path.getsize(j.path) for j in job.jobs if os.path.exists(j.path)))
+        total_cost = sum(job.costs) or 1
+        lines = [f"Wrote {len(job.jobs)} shards in {job.elapsed:.1f}s.", "", "| Shard | Tasks | Share of cost |", "|---|---|---|"]
+        for k, (shard, cost) in enumerate(zip(job.jobs, job.costs), 1):
+            lines.append(f"| {k} | {shard.total} | {cost / total_cost:.1%} |")
+        return (gr.update(value=[j.path for j in job.jobs], visible=True), gr.update(value="\n".join(lines), visible=True),
+                gr.Timer(active=False), None)
+
+    @_instrumented("save_current_queue")
+    def save_current_queue(self, queue, running_job_id=None):
         if not queue:
             gr.Warning("Queue is empty, nothing to save.")
-            return None
+            return running_job_id, gr.update(), gr.update()
+        if running_job_id in self._export_jobs:
+            gr.Info("An export is already running.")
+            return running_job_id, gr.update(), gr.update()
+        if not self._check_resolvable(queue, "save the queue"):
+            return running_job_id, gr.update(), gr.update()
         try:
+            self._cleanup_stale_exports()
             f = tempfile.NamedTemporaryFile(delete=False, suffix=".zip", prefix="modified_queue_")
             f.close()
-            filename = f.name
-            success = self._save_queue_to_zip(queue, filename)
-            if success:
-                return gr.File(value=filename, visible=False, label="queue.zip")
-            else:
-                gr.Error("Failed to save queue zip.")
-                return None
+            job = QueueExportJob(queue, f.name, self._get_archive)
+            job_id = os.path.basename(f.name)
+            self._export_jobs[job_id] = job.start()
+            return job_id, gr.update(value=f"Exporting 0/{job.total} tasks...", visible=True), gr.Timer(active=True)
         except Exception as e:
             print(f"Error saving queue: {e}")
-            gr.Error(f"Error saving queue: {e}")
-            return None
\ No newline at end of file
+            gr.Warning(f"Error saving queue: {e}")
+            return None, gr.update(visible=False), gr.Timer(active=False)
+
+    def poll_export_job(self, job_id):
+        job = self._export_jobs.get(job_id)
+        if job is None:
+            return gr.update(), gr.update(visible=False), gr.Timer(active=False), None
+        if not job.finished:
+            return gr.update(), gr.update(value=f"Exporting {job.done}/{job.total} tasks...", visible=True), gr.update(), job_id
+
+        del self._export_jobs[job_id]
+        if job.error:
+            gr.Warning(f"Error saving queue: {job.error}")
+            return gr.update(), gr.update(visible=False), gr.Timer(active=False), None
+        try:
+            self.stats.record("export:write_zip", job.elapsed, os.path.getsize(job.path))
+        except OSError:
+            pass
+        status = f"Exported {job.total} tasks in {job.elapsed:.1f}s."
+        if job.deduplicated:
+            status += f" {job.deduplicated} repeated media file(s) were stored once."
+        return gr.File(value=job.path, visible=False, label="queue.zip"), gr.update(value=status, visible=True), gr.Timer(active=False), None
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""Tests for the Queue Editor that need no running WAN2GP, only its importable modules.
+
+Run them from a WAN2GP checkout with this plugin installed under plugins/, or point
+QM_WAN2GP_ROOT at one. They are skipped when gradio or the host package is missing.
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WAN2GP_ROOT = os.environ.get("QM_WAN2GP_ROOT", os.path.dirname(os.path.dirname(PLUGIN_DIR)))
+
+
+def _load_benchmark():
+    spec = importlib.util.spec_from_file_location("bench_queue_editor", os.path.join(PLUGIN_DIR, "benchmarks", "bench_queue_editor.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+bench = _load_benchmark()
+
+
+@pytest.fixture(scope="module")
+def plugin_module():
+    if WAN2GP_ROOT not in sys.path:
+        sys.path.insert(0, WAN2GP_ROOT)
+    pytest.importorskip("gradio")
+    pytest.importorskip("shared.utils.plugins")
+    return bench.load_plugin_module(WAN2GP_ROOT)
+
+
+def test_expression_rejects_string_formatting(plugin_module):
+    expression = plugin_module.ParamExpression("'%0200000000d' % 1")
+    with pytest.raises(ValueError):
+        expression({})
+
+
+def test_expression_keeps_numeric_modulo(plugin_module):
+    assert plugin_module.ParamExpression("value % 7")({}, value=23) == 2
+
+
+def test_written_queue_reads_back_through_parse_queue_zip(plugin_module, tmp_path):
+    # The benchmark's parse_queue_zip reads the layout the host's _parse_queue_zip does.
+    from PIL import Image
+
+    stubs = bench.HostStubs(str(tmp_path), (32, 32))
+    start, end = Image.new("RGB", (32, 32), (200, 10, 10)), Image.new("RGB", (32, 32), (10, 200, 10))
+    path = str(tmp_path / "queue.zip")
+    writer = plugin_module.QueueZipWriter(path, lambda source: None)
+    writer.add_task(1, {"prompt": "first", "image_start": [start], "image_end": [end]}, None)
+    writer.add_task(2, {"prompt": "second", "image_start": [start]}, None)
+    writer.close()
+
+    tasks, error = stubs.parse_queue_zip(path, {})
+    assert error is None
+    assert [(task["id"], task["prompt"]) for task in tasks] == [(1, "first"), (2, "second")]
+    assert tasks[0]["params"]["image_start"][0].tobytes() == start.tobytes()
+    assert tasks[0]["params"]["image_end"][0].tobytes() == end.tobytes()
+    assert tasks[1]["params"]["image_start"][0].tobytes() == start.tobytes()